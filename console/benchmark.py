@@ -1,58 +1,185 @@
+import argparse
+import csv
+import json
 import logging
+import multiprocessing as mp
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
 import pandas as pd
 
-from pathlib import Path
-from rc_modules import Doc2vec, Tfidf, Word2vec
-from sys import exit
+from rc_modules import Dataset, Doc2vec, Tfidf, Word2vec
 
 logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s',
                     level=logging.INFO)
 
-def load_query_set():
-    url = 'https://raw.githubusercontent.com/rochimfn/tanyahukum-bot/main/dataset.csv'
-    df = pd.read_csv(url, sep='\t', quotechar='\'')
-    df['dataset'] = df['Context'] + ' ' + df['Response']
-    return list(df['Context'])
+MODELS = {'tfidf': Tfidf, 'word2vec': Word2vec, 'doc2vec': Doc2vec}
+SYLLABLES = ['ka', 'ta', 'na', 'ra', 'sa', 'ma', 'la', 'pa', 'da', 'ga', 'ba', 'ja',
+             'ke', 'te', 'ne', 're', 'se', 'me', 'le', 'pe', 'de', 'ge', 'be',
+             'ki', 'ti', 'ni', 'ri', 'si', 'mi', 'li', 'pi', 'di', 'gi', 'bi',
+             'ku', 'tu', 'nu', 'ru', 'su', 'mu', 'lu', 'pu', 'du', 'gu', 'bu',
+             'an', 'ang', 'ar', 'at', 'kan', 'lah', 'nya', 'per', 'ber', 'ter']
+
+
+def make_vocabulary(size: int, rng: np.random.Generator) -> np.ndarray:
+    words = set()
+    while len(words) < size:
+        length = rng.integers(2, 5)
+        words.add(''.join(rng.choice(SYLLABLES, size=length)))
+    return np.array(sorted(words))
+
+
+def make_column(vocabulary: np.ndarray, probabilities: np.ndarray, num_docs: int,
+                min_words: int, max_words: int, rng: np.random.Generator) -> List[str]:
+    lengths = rng.integers(min_words, max_words + 1, size=num_docs)
+    words = vocabulary[rng.choice(len(vocabulary), size=lengths.sum(), p=probabilities)]
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    return [' '.join(words[start:end]) for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def make_dataset(num_docs: int, vocabulary_size: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    vocabulary = make_vocabulary(vocabulary_size, rng)
+    probabilities = 1.0 / np.arange(1, len(vocabulary) + 1)
+    probabilities /= probabilities.sum()
+    return pd.DataFrame({
+        'Context': make_column(vocabulary, probabilities, num_docs, 5, 12, rng),
+        'Keywords': make_column(vocabulary, probabilities, num_docs, 2, 4, rng),
+        'Response': make_column(vocabulary, probabilities, num_docs, 15, 60, rng)
+    })
+
+
+def peak_rss_bytes() -> int:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def directory_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+def build_model(name: str, dataset_path: str, cache_path: str, epochs: int) -> Dict[str, Any]:
+    df = Dataset(source=dataset_path, store=f'{dataset_path}.store').load()
+
+    model = MODELS[name]()
+    if epochs > 0 and name == 'word2vec':
+        model.set_options({**model.options, 'iter': epochs})
+    elif epochs > 0 and name == 'doc2vec':
+        model.set_options({**model.options, 'epochs': epochs})
+    model.set_dataframe(dataframe=df, dataset_key='dataset')
+    start = time.perf_counter()
+    model.create_cache(cache_path)
+    build_seconds = time.perf_counter() - start
+    return {'build_seconds': build_seconds,
+            'cache_bytes': directory_bytes(Path(cache_path)),
+            'build_peak_rss_bytes': peak_rss_bytes()}
+
+
+def serve_model(name: str, cache_path: str, queries: List[str], num_rank: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    model = MODELS[name](cache=cache_path)
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        query_start = time.perf_counter()
+        model.ask(query, num_rank=num_rank)
+        latencies.append(time.perf_counter() - query_start)
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {'cold_load_seconds': load_seconds,
+            'ask_mean_ms': float(np.mean(latencies) * 1000),
+            'ask_p50_ms': float(p50),
+            'ask_p95_ms': float(p95),
+            'ask_p99_ms': float(p99),
+            'ask_per_second': len(queries) / elapsed,
+            'serve_peak_rss_bytes': peak_rss_bytes()}
+
+
+def run_isolated(func, *args) -> Dict[str, Any]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context('spawn')) as pool:
+        return pool.submit(func, *args).result()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
 
 def main():
-    save_dir = input('Simpan hasil ke direktori: ')
-    save_path = Path(save_dir)
-    if save_path.is_dir:
-        logging.info('Direktori valid, tunggu sebentar :)')
+    parser = argparse.ArgumentParser(
+        description='Offline build/load/latency benchmark on synthetic corpora.')
+    parser.add_argument('--sizes', default='100,1000,10000,100000,1000000',
+                        help='comma separated corpus sizes')
+    parser.add_argument('--models', default='tfidf,word2vec,doc2vec')
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--num-rank', type=int, default=10)
+    parser.add_argument('--epochs', type=int, default=0,
+                        help='override word2vec/doc2vec epochs (0 keeps model defaults)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default='.cache/benchmark')
+    parser.add_argument('--output', default='benchmark.json',
+                        help='results file, .json or .csv')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    names = args.models.split(',')
+    unknown = [name for name in names if name not in MODELS]
+    if unknown:
+        parser.error(f'Unknown models: {", ".join(unknown)}')
+
+    workdir = Path(args.workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    results = []
+    for size in sizes:
+        logging.info(f'Generating {size} documents')
+        df = make_dataset(size, args.vocabulary, args.seed)
+        dataset_path = workdir / f'dataset_{size}.tsv'
+        df.to_csv(dataset_path, sep='\t', quotechar='\'', index=False)
+        rng = np.random.default_rng(args.seed + 1)
+        queries = df['Context'].iloc[rng.integers(0, size, size=args.queries)].tolist()
+        del df
+
+        for name in names:
+            cache_path = str(workdir / f'{name}_{size}')
+            logging.info(f'Benchmarking {name} on {size} documents')
+            result = {'model': name, 'documents': size, 'queries': len(queries)}
+            result.update(run_isolated(build_model, name, str(dataset_path),
+                                       cache_path, args.epochs))
+            result.update(run_isolated(serve_model, name, cache_path,
+                                       queries, args.num_rank))
+            results.append(result)
+            logging.info(json.dumps(result))
+
+    output = Path(args.output)
+    if output.suffix == '.csv':
+        with open(output, 'w', newline='') as fd:
+            writer = csv.DictWriter(fd, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
     else:
-        logging.error('Direktori tidak valid')
-        exit(1)
-
-    doc2vec = Doc2vec()
-    doc2vec.load('.cache/model_doc2vec')
-
-    word2vec = Word2vec()
-    word2vec.load('.cache/model_word2vec')
-
-    tfidf = Tfidf()
-    tfidf.load('.cache/model_tfidf')
-
-    query_set = load_query_set()
-    writer_doc2vec = pd.ExcelWriter(save_path / 'doc2vec.xlsx', engine='xlsxwriter')
-    writer_word2vec = pd.ExcelWriter(save_path / 'word2vec.xlsx', engine='xlsxwriter')
-    writer_tfidf = pd.ExcelWriter(save_path / 'tfidf.xlsx', engine='xlsxwriter')
-
-    for index, question in enumerate(query_set):
-        answer = doc2vec.ask(question)
-        answer['Rank'] = answer.reset_index().index + 1
-        answer[['Rank','Response']].to_excel(writer_doc2vec, sheet_name=f'{index}. {question}'[:31])
-
-        answer = word2vec.ask(question)
-        answer['Rank'] = answer.reset_index().index + 1
-        answer[['Rank', 'Response']].to_excel(writer_word2vec, sheet_name=f'{index}. {question}'[:31])
-
-        answer = tfidf.ask(question)
-        answer['Rank'] = answer.reset_index().index + 1
-        answer[['Rank', 'Response']].to_excel(writer_tfidf, sheet_name=f'{index}. {question}'[:31])
-    
-    writer_doc2vec.save()
-    writer_word2vec.save()
-    writer_tfidf.save()
+        report = {'commit': git_commit(),
+                  'python': platform.python_version(),
+                  'platform': platform.platform(),
+                  'args': vars(args),
+                  'results': results}
+        with open(output, 'w') as fd:
+            json.dump(report, fd, indent=2)
+    logging.info(f'Results written to {output}')
+
 
 if __name__ == '__main__':
     main()
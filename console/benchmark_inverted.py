@@ -0,0 +1,64 @@
+import argparse
+import logging
+import random
+import time
+
+import numpy as np
+
+from rc_modules import CacheStore, Tfidf
+
+logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s',
+                    level=logging.INFO)
+
+
+def make_queries(responses, num_queries: int, num_words: int, seed: int):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(num_queries):
+        words = responses[rng.randrange(len(responses))].split()
+        queries.append(' '.join(rng.sample(words, min(num_words, len(words)))))
+    return queries
+
+
+def measure(model: Tfidf, queries, num_rank: int, inverted: bool):
+    answers, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        answers.append(model.ask(query, num_rank=num_rank, inverted=inverted))
+        latencies.append(time.perf_counter() - start)
+    return answers, np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare exact and inverted-index Tfidf scoring.')
+    parser.add_argument('--cache', help='Tfidf cache directory (default: current model version)')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--words', type=int, default=4)
+    parser.add_argument('--num-rank', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.cache is None:
+        store = CacheStore()
+        args.cache = str(store.path(store.current()) / 'tfidf')
+    model = Tfidf(cache=args.cache)
+    queries = make_queries(model.responses, args.queries,
+                           args.words, args.seed)
+    model.ask(queries[0], inverted=True)
+
+    exact, exact_ms = measure(model, queries, args.num_rank, inverted=False)
+    inverted, inverted_ms = measure(model, queries, args.num_rank, inverted=True)
+
+    same = sum(np.allclose(np.sort(a.scores), np.sort(b.scores))
+               for a, b in zip(exact, inverted))
+    print(f'Documents: {model.matrix.shape[0]}, queries: {len(queries)}')
+    for name, latencies in (('exact', exact_ms), ('inverted', inverted_ms)):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f'{name:>8}: mean {latencies.mean():.3f} ms, p50 {p50:.3f} ms, '
+              f'p95 {p95:.3f} ms, p99 {p99:.3f} ms')
+    print(f'Same top-{args.num_rank} scores: {same}/{len(queries)}')
+
+
+if __name__ == '__main__':
+    main()
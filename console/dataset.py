@@ -0,0 +1,11 @@
+from rc_modules import Dataset
+
+
+def main():
+    dataset = Dataset()
+    df = dataset.load()
+    print(f'Rows: {len(df)}, sha256: {dataset.checksum}')
+
+
+if __name__ == '__main__':
+    main()
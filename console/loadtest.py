@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s',
+                    level=logging.INFO)
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+Result = Tuple[str, float, Optional[int]]
+
+
+def request_stream(questions: List[str], algorithms: List[str]) -> Iterator[Tuple[str, str]]:
+    for question in itertools.cycle(questions):
+        for algorithm in algorithms:
+            yield algorithm, question
+
+
+def load_questions(path: str) -> List[str]:
+    with open(path, 'r') as fd:
+        questions = [line.strip() for line in fd if line.strip()]
+    if not questions:
+        raise Exception(f'No question found in {path}')
+    return questions
+
+
+async def send(client: httpx.AsyncClient, algorithm: str, question: str,
+               num_rank: int, scheduled: float, results: List[Result]):
+    status = None
+    try:
+        response = await client.get(f'/{algorithm}/', params={'q': question, 'num_rank': num_rank})
+        status = response.status_code
+    except httpx.HTTPError as e:
+        logging.debug(f'Request failed: {e!r}')
+    results.append((algorithm, time.perf_counter() - scheduled, status))
+
+
+async def run_concurrency(client: httpx.AsyncClient, requests, num_rank: int, concurrency: int,
+                          deadline: float, results: List[Result]):
+    async def worker():
+        for algorithm, question in requests:
+            if time.perf_counter() >= deadline:
+                return
+            await send(client, algorithm, question, num_rank, time.perf_counter(), results)
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+
+async def run_rate(client: httpx.AsyncClient, requests, num_rank: int, rate: float,
+                   deadline: float, results: List[Result]):
+    tasks = []
+    start = time.perf_counter()
+    for i, (algorithm, question) in enumerate(requests):
+        scheduled = start + i / rate
+        if scheduled >= deadline:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(
+            send(client, algorithm, question, num_rank, scheduled, results)))
+    await asyncio.gather(*tasks)
+
+
+def summarize(results: List[Result], elapsed: float) -> Dict[str, Dict[str, float]]:
+    groups: Dict[str, List[Result]] = {'all': results}
+    for result in results:
+        groups.setdefault(result[0], []).append(result)
+
+    summary = {}
+    for name, group in groups.items():
+        latencies = np.array([latency for _, latency, _ in group]) * 1000
+        errors = sum(1 for _, _, status in group if status != 200)
+        p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99]) if len(group) else [0.0] * 4
+        summary[name] = {'requests': len(group),
+                         'errors': errors,
+                         'error_rate': errors / len(group) if group else 0.0,
+                         'throughput': len(group) / elapsed,
+                         'p50_ms': float(p50),
+                         'p90_ms': float(p90),
+                         'p95_ms': float(p95),
+                         'p99_ms': float(p99),
+                         'max_ms': float(latencies.max()) if len(group) else 0.0}
+    return summary
+
+
+def start_server(host: str, port: int) -> subprocess.Popen:
+    env = {**os.environ, 'QA_HOST': host, 'QA_PORT': str(port)}
+    web_path = Path(__file__).resolve().parent.parent / 'web.py'
+    process = subprocess.Popen([sys.executable, str(web_path)], env=env)
+    for _ in range(600):
+        if process.poll() is not None:
+            raise Exception('API server exited during startup')
+        try:
+            if httpx.get(f'http://{host}:{port}/').status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise Exception('API server did not start in time')
+
+
+async def run(args, questions: List[str]) -> Tuple[List[Result], float]:
+    requests = request_stream(questions, args.algorithms.split(','))
+    if args.requests:
+        requests = itertools.islice(requests, args.requests)
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    if args.asgi:
+        os.environ.setdefault('QA_HOST', '127.0.0.1')
+        os.environ.setdefault('QA_PORT', '8000')
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+        import web
+        transport = httpx.ASGITransport(app=web.app)
+        client = httpx.AsyncClient(transport=transport, base_url='http://loadtest',
+                                   timeout=args.timeout)
+        lifespan = web.app.router.lifespan_context(web.app)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits)
+        lifespan = None
+
+    results: List[Result] = []
+    async with client:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            start = time.perf_counter()
+            deadline = start + args.duration if args.duration else float('inf')
+            if args.rate:
+                await run_rate(client, requests, args.num_rank, args.rate, deadline, results)
+            else:
+                await run_concurrency(client, requests, args.num_rank, args.concurrency,
+                                      deadline, results)
+            elapsed = time.perf_counter() - start
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Replay questions against the HTTP API at a fixed rate or concurrency.')
+    parser.add_argument('questions', help='text file with one question per line')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', help='base URL of a running API (default from QA_HOST/QA_PORT)')
+    target.add_argument('--spawn', action='store_true',
+                        help='start web.py locally on QA_HOST/QA_PORT for the run')
+    target.add_argument('--asgi', action='store_true',
+                        help='call web.app in-process through the ASGI transport, no network')
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument('--concurrency', type=int, default=8,
+                      help='number of requests in flight (closed loop, default)')
+    load.add_argument('--rate', type=float, help='requests per second (open loop)')
+    parser.add_argument('--algorithms', default='tfidf,word2vec,doc2vec')
+    parser.add_argument('--num-rank', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=0, help='stop after this many requests')
+    parser.add_argument('--duration', type=float, default=0, help='stop after this many seconds')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--output', help='write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    if not args.requests and not args.duration:
+        parser.error('Set --requests and/or --duration')
+
+    server = None
+    if args.url is None and not args.asgi:
+        host = os.environ.get('QA_HOST', '127.0.0.1')
+        port = int(os.environ.get('QA_PORT', 8000))
+        args.url = f'http://{host}:{port}'
+        if args.spawn:
+            server = start_server(host, port)
+
+    try:
+        results, elapsed = asyncio.run(run(args, load_questions(args.questions)))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(results, elapsed)
+    mode = f'rate {args.rate}/s' if args.rate else f'concurrency {args.concurrency}'
+    print(f'{len(results)} requests in {elapsed:.2f} s ({mode})')
+    for name, stats in summary.items():
+        print(f'{name:>9}: {stats["throughput"]:.1f} req/s, errors {stats["errors"]} '
+              f'({stats["error_rate"]:.2%}), p50 {stats["p50_ms"]:.1f} ms, '
+              f'p95 {stats["p95_ms"]:.1f} ms, p99 {stats["p99_ms"]:.1f} ms, '
+              f'max {stats["max_ms"]:.1f} ms')
+
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump({'args': vars(args), 'elapsed': elapsed, 'summary': summary}, fd, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,9 +3,9 @@ import json
 import os
 from typing import List
 
-import pandas as pd
 import requests
-from rc_modules import Doc2vec, Tfidf, Word2vec
+from rc_modules import CacheStore, Dataset, Doc2vec, Tfidf, Word2vec
+from rc_modules.Evaluation import evaluate
 
 NUM_RANK = int(os.getenv('NUM_RANK', 5))
 
@@ -14,9 +14,7 @@ logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s',
 
 
 def load_questions() -> List[str]:
-    url = 'https://raw.githubusercontent.com/rochimfn/tanyahukum-bot/main/dataset.csv'
-    df = pd.read_csv(url, sep='\t', quotechar='\'')
-    return df['Context'].tolist()
+    return Dataset().load()['Context'].tolist()
 
 
 def load_test_questions() -> List[str]:
@@ -30,34 +28,17 @@ def load_test_questions() -> List[str]:
         raise Exception('Fail to load test questions')
 
 
-def get_mrr(questions: List[str]) -> dict:
+def get_metrics(questions: List[str]) -> dict:
+    store = CacheStore()
+    cache_path = store.path(store.current())
     models = {
-        'tfidf': Tfidf(cache='.cache/tfidf'),
-        'word2vec': Word2vec(cache='.cache/word2vec'),
-        'doc2vec': Doc2vec(cache='.cache/doc2vec')
+        'tfidf': Tfidf(cache=str(cache_path / 'tfidf')),
+        'word2vec': Word2vec(cache=str(cache_path / 'word2vec')),
+        'doc2vec': Doc2vec(cache=str(cache_path / 'doc2vec'))
     }
 
-    def f_get_mrr(index, question, model):
-        answer: pd.DataFrame = model.ask(question, num_rank=NUM_RANK)
-        if index in answer.index.to_list():
-            return 1/(answer.index.to_list().index(index)+1)
-
-        return 0
-
-    results = {
-        'tfidf': [],
-        'word2vec': [],
-        'doc2vec': []
-    }
-    for index, question in enumerate(questions):
-        for key, model in models.items():
-            results[key].append(f_get_mrr(index, question, model))
-
-    return results
-
-
-def calculate_mrr(list_of_value: List[int]) -> int:
-    return sum(list_of_value) / len(list_of_value)
+    return {key: evaluate(model, questions).metrics(ks=(1, NUM_RANK))
+            for key, model in models.items()}
 
 
 def main():
@@ -65,12 +46,14 @@ def main():
     test_questions = load_test_questions()
 
     print('Dataset:')
-    for key, value in get_mrr(questions).items():
-        print(f'mrr {key}: {calculate_mrr(value)}')
+    for key, value in get_metrics(questions).items():
+        print(f'mrr {key}: {value[f"mrr@{NUM_RANK}"]} '
+              f'(hit@1 {value["hit@1"]:.3f}, hit@{NUM_RANK} {value[f"hit@{NUM_RANK}"]:.3f})')
 
     print('\nTesting:')
-    for key, value in get_mrr(test_questions).items():
-        print(f'mrr {key}: {calculate_mrr(value)}')
+    for key, value in get_metrics(test_questions).items():
+        print(f'mrr {key}: {value[f"mrr@{NUM_RANK}"]} '
+              f'(hit@1 {value["hit@1"]:.3f}, hit@{NUM_RANK} {value[f"hit@{NUM_RANK}"]:.3f})')
 
 
 if __name__ == '__main__':
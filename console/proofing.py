@@ -0,0 +1,43 @@
+from rc_modules import Proofing
+
+
+def main():
+    p = Proofing()
+    print(f'Length of dictionary {len(p.dict)}')
+
+    word = 'Pulang'
+    print(f'Word {word} in dictionary: {p.check_word(word)}')
+
+    false_word = 'Pulagn'
+    try:
+        print(f'Word {false_word} in dictionary: {p.check_word(false_word)}')
+    except ValueError as e:
+        print(e.args[0])
+
+    sentence = 'Bapak pulang kampung'
+    print(f'Kalimat : {sentence}')
+    print(f'Hasil: {p.check_words(sentence)}')
+
+    try:
+        false_sentence = 'Bapak pulagn kampung'
+        print(f'Kalimat : {false_sentence}')
+        print(f'Hasil: {p.check_words(false_sentence)}')
+    except ValueError as e:
+        print(e.args[0])
+
+    another_sentence = 'bgmn bisa'
+    print(f'Kalimat : {another_sentence}')
+    print(f'Hasil: {p.check_words(another_sentence)}')
+
+    try:
+        another_false_sentence = 'bg bisa'
+        print(f'Kalimat : {another_false_sentence}')
+        print(f'Hasil: {p.check_words(another_false_sentence)}')
+    except ValueError as e:
+        print(e.args[0])
+
+    print(f'Cache: {Proofing.cache_info()}')
+
+
+if __name__ == '__main__':
+    main()
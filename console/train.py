@@ -1,27 +1,106 @@
 import logging
+import multiprocessing as mp
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
 
-import pandas as pd
+from rc_modules import CacheStore, Dataset, Doc2vec, Word2vec, Tfidf
+from rc_modules.Preprocessing import TokenizedCorpus
 
-from rc_modules import Doc2vec, Word2vec, Tfidf
+try:
+    import resource
+except ImportError:
+    resource = None
 
 logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s',
                     level=logging.INFO)
 
 
-def load_data():
-    url = 'https://raw.githubusercontent.com/rochimfn/tanyahukum-bot/main/dataset.csv'
-    df = pd.read_csv(url, sep='\t', quotechar='\'')
-    df['dataset'] = df['Context'] + ' ' + df['Keywords'] + ' ' + df['Response']
-    return df
+def cpu_setting(name: str, default: int, high: int) -> int:
+    value = int(os.getenv(name, default))
+    clamped = max(1, min(value, high))
+    if clamped != value:
+        logging.warning(f'{name}={value} does not fit the CPU budget, using {clamped}')
+    return clamped
+
+
+ANN_LISTS = int(os.getenv('ANN_LISTS', 0))
+TRAIN_CPUS = max(1, int(os.getenv('TRAIN_CPUS', os.cpu_count() or 1)))
+TRAIN_PROCESSES = cpu_setting('TRAIN_PROCESSES', min(3, TRAIN_CPUS), min(3, TRAIN_CPUS))
+# At most two gensim models train at once. TF-IDF fits on one core and only
+# takes it from them when all three models run side by side.
+GENSIM_JOBS = min(TRAIN_PROCESSES, 2)
+GENSIM_CPUS = TRAIN_CPUS - (TRAIN_PROCESSES - GENSIM_JOBS)
+DOC2VEC_WORKERS = cpu_setting('DOC2VEC_WORKERS', -(-GENSIM_CPUS // GENSIM_JOBS),
+                              GENSIM_CPUS - (GENSIM_JOBS - 1))
+WORD2VEC_CPUS = GENSIM_CPUS - DOC2VEC_WORKERS * (GENSIM_JOBS - 1)
+WORD2VEC_WORKERS = cpu_setting('WORD2VEC_WORKERS', WORD2VEC_CPUS, WORD2VEC_CPUS)
+
+MODELS = {'doc2vec': (Doc2vec, DOC2VEC_WORKERS),
+          'word2vec': (Word2vec, WORD2VEC_WORKERS),
+          'tfidf': (Tfidf, 1)}
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+
+def build_model(name: str, path: str, corpus_prefix: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    model_class, workers = MODELS[name]
+    model = model_class()
+    model.set_dataframe(dataframe=Dataset().load(), dataset_key='dataset',
+                        corpus=TokenizedCorpus.load(Path(corpus_prefix)))
+    if name == 'tfidf':
+        model.create_cache(path)
+    else:
+        model.set_options({**model.options, 'workers': workers})
+        model.create_cache(path, ann_lists=ANN_LISTS)
+    return {'model': name,
+            'workers': workers,
+            'seconds': time.perf_counter() - start,
+            'peak_rss_mb': peak_rss_mb()}
+
+
+def build_model_star(args) -> Dict[str, Any]:
+    return build_model(*args)
 
 
 def main():
-    df = load_data()
+    start = time.perf_counter()
+    df = Dataset().load()
+    store = CacheStore()
+    version = store.create()
+    # The token arrays belong to this version, next to the models built from them.
+    corpus_prefix = store.path(version) / 'corpus'
+    TokenizedCorpus.from_texts(df['dataset']).save(corpus_prefix)
+
+    jobs = [(name, str(store.path(version) / name), str(corpus_prefix)) for name in MODELS]
+    logging.info(f'Building {", ".join(MODELS)} in {TRAIN_PROCESSES} processes '
+                 f'with a budget of {TRAIN_CPUS} CPUs')
+
+    # Keep BLAS from spreading each process over every core.
+    for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(variable, '1')
+    # One fresh process per model so the peak RSS belongs to that model alone.
+    with mp.get_context('spawn').Pool(TRAIN_PROCESSES, maxtasksperchild=1) as pool:
+        reports = list(pool.imap_unordered(build_model_star, jobs))
+
+    store.publish(version)
+    logging.info(f'Published model cache version {version}')
 
-    models = {'tfidf': Tfidf(), 'doc2vec': Doc2vec(), 'word2vec': Word2vec()}
-    for name, model in models.items():
-        model.set_dataframe(dataframe=df, dataset_key='dataset')
-        model.create_cache(f'.cache/{name}')
+    for report in sorted(reports, key=lambda report: report['model']):
+        peak = f'{report["peak_rss_mb"]:.0f} MiB' if report['peak_rss_mb'] is not None else 'n/a'
+        print(f'{report["model"]:>8}: {report["seconds"]:.1f} s, peak RSS {peak}, '
+              f'{report["workers"]} workers')
+    print(f'   total: {time.perf_counter() - start:.1f} s wall, '
+          f'{sum(report["seconds"] for report in reports):.1f} s summed over models')
 
 
 if __name__ == '__main__':
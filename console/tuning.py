@@ -1,108 +1,193 @@
+import argparse
+import json
 import logging
+import math
 import multiprocessing as mp
+import time
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
 
-from rc_modules import Word2vec, Doc2vec
+from rc_modules import Dataset, Doc2vec, Word2vec
+from rc_modules.Evaluation import evaluate
+from rc_modules.Preprocessing import TokenizedCorpus
 
 logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s',
                     level=logging.INFO)
 
+Trial = Tuple[str, int, int, int]
 
-def load_data():
-    cache = Path('.cache/dataframe.pickle')
-    if cache.is_file():
-        return pd.read_pickle(cache)
-    else:
-        url = 'https://raw.githubusercontent.com/rochimfn/tanyahukum-bot/main/dataset.csv'
-        df = pd.read_csv(url, sep='\t', quotechar='\'')
-        df['dataset'] = df['Keywords'] + ' ' + df['Context'] + ' ' + df['Response']
-        df.to_pickle('.cache/dataframe')
-        return df
-
-
-def count_correct(algorithm: str, options: Dict[str, int]) -> int:
-    models = {
-        'word2vec': Word2vec(),
-        'doc2vec': Doc2vec()
-    }
-    df = load_data()
-    model = models[algorithm]
-    model.set_dataframe(dataframe=df, dataset_key='dataset')
-    model.set_options(options)
-    counter = 0
-    for index, row in df.iterrows():
-        question = row['Context']
-        answer = model.ask(question)
-
-        if index in answer.index.to_list() and answer.index.to_list().index(index) == 0:
-            counter += 1
-    return counter
-
-
-def f_tune_vector_word2vec(vector_size: int) -> (int, int):
-    logging.info(f'word2vec:vector_size:{vector_size}')
-    options = {
-        'size': vector_size,
-        'min_count': 2,
-        'iter': 40
-    }
-    counter = count_correct('word2vec', options)
-    return vector_size, counter
-
-
-def f_tune_iter_word2vec(iter_size: int) -> (int, int):
-    logging.info(f'word2vec:vector_size:{iter_size}')
-    options = {
-        'size': 50,
-        'min_count': 2,
-        'iter': iter_size
-    }
-    counter = count_correct('word2vec', options)
-    return iter_size, counter
-
-
-def f_tune_vector_doc2vec(vector_size: int) -> (int, int):
-    logging.info(f'doc2vec:vector_size:{vector_size}')
-    options = {
-        'vector_size': vector_size,
-        'min_count': 2,
-        'epochs': 40
-    }
-    counter = count_correct('doc2vec', options)
-    return vector_size, counter
-
-
-def f_tune_iter_doc2vec(iter_size: int) -> (int, int):
-    logging.info(f'doc2vec:iter:{iter_size}')
-    options = {
-        'vector_size': 50,
-        'min_count': 2,
-        'epochs': iter_size
-    }
-    counter = count_correct('doc2vec', options)
-    return iter_size, counter
+MODELS = {'word2vec': Word2vec, 'doc2vec': Doc2vec}
+dataset: Optional[pd.DataFrame] = None
+corpus: Optional[TokenizedCorpus] = None
+queries: Optional[List[List[str]]] = None
+
+
+def make_options(algorithm: str, vector_size: int, epochs: int, min_count: int) -> Dict[str, int]:
+    if algorithm == 'word2vec':
+        return {'size': vector_size, 'min_count': min_count, 'iter': epochs}
+    return {'vector_size': vector_size, 'min_count': min_count, 'epochs': epochs}
+
+
+def init_worker(df: pd.DataFrame, corpus_prefix: str, queries_prefix: str):
+    global dataset, corpus, queries
+    logging.getLogger('gensim').setLevel(logging.WARNING)
+    dataset = df
+    corpus = TokenizedCorpus.load(Path(corpus_prefix))
+    queries = TokenizedCorpus.load(Path(queries_prefix)).documents()
+
+
+def run_trial(trial: Trial, ks: Tuple[int, ...]) -> Dict[str, Any]:
+    algorithm, vector_size, epochs, min_count = trial
+    model = MODELS[algorithm]()
+    model.set_options(make_options(algorithm, vector_size, epochs, min_count))
+    model.set_dataframe(dataframe=dataset, dataset_key='dataset', corpus=corpus)
+
+    start = time.perf_counter()
+    metrics = evaluate(model, queries).metrics(ks=ks)
+    return {'algorithm': algorithm,
+            'vector_size': vector_size,
+            'epochs': epochs,
+            'min_count': min_count,
+            'seconds': time.perf_counter() - start,
+            **metrics}
+
+
+def run_trial_star(args) -> Dict[str, Any]:
+    return run_trial(*args)
+
+
+def trial_key(result: Dict[str, Any]) -> Trial:
+    return result['algorithm'], result['vector_size'], result['epochs'], result['min_count']
+
+
+def load_checkpoint(path: Path, checksum: str) -> Dict[Trial, Dict[str, Any]]:
+    results = {}
+    if path.is_file():
+        with open(path, 'r') as fd:
+            for line in fd:
+                if line.strip():
+                    result = json.loads(line)
+                    if result.get('dataset_sha256') == checksum:
+                        results[trial_key(result)] = result
+    return results
+
+
+def parse_range(value: str) -> List[int]:
+    if ':' in value:
+        return list(range(*[int(part) for part in value.split(':')]))
+    return [int(part) for part in value.split(',')]
+
+
+def rung_budgets(min_epochs: int, max_epochs: int, eta: int) -> List[int]:
+    budgets = [max_epochs]
+    while budgets[-1] // eta >= min_epochs:
+        budgets.append(budgets[-1] // eta)
+    return budgets[::-1]
+
+
+def run_rung(pool, trials: List[Trial], results: Dict[Trial, Dict[str, Any]], checkpoint: Path,
+             checksum: str, ks: Tuple[int, ...]):
+    pending = [trial for trial in trials if trial not in results]
+    logging.info(f'{len(trials) - len(pending)} trials from checkpoint, {len(pending)} to run')
+    with open(checkpoint, 'a') as fd:
+        for result in pool.imap_unordered(run_trial_star, [(trial, ks) for trial in pending]):
+            result['dataset_sha256'] = checksum
+            results[trial_key(result)] = result
+            fd.write(json.dumps(result) + '\n')
+            fd.flush()
+            logging.info(json.dumps(result))
+
+
+def successive_halving(pool, algorithm: str, vector_sizes: List[int], budgets: List[int], eta: int,
+                       metric: str, min_count: int, results: Dict[Trial, Dict[str, Any]],
+                       checkpoint: Path, checksum: str, ks: Tuple[int, ...]) -> List[Dict[str, Any]]:
+    survivors = list(vector_sizes)
+    # Each rung trains from scratch: continuing a gensim model for more epochs
+    # restarts the learning-rate decay, so it would not match a model trained
+    # for the full budget in one go.
+    for rung, epochs in enumerate(budgets):
+        logging.info(f'{algorithm}: rung {rung} with {len(survivors)} configurations at {epochs} epochs')
+        trials = [(algorithm, vector_size, epochs, min_count) for vector_size in survivors]
+        run_rung(pool, trials, results, checkpoint, checksum, ks)
+        ranked = sorted(trials, key=lambda trial: -results[trial][metric])
+        survivors = [vector_size for _, vector_size, _, _ in ranked]
+        if rung < len(budgets) - 1:
+            survivors = survivors[:max(1, math.ceil(len(survivors) / eta))]
+    return [results[(algorithm, vector_size, budgets[-1], min_count)] for vector_size in survivors]
+
+
+def sweep_epochs(pool, algorithm: str, vector_size: int, epochs: List[int], metric: str,
+                 min_count: int, results: Dict[Trial, Dict[str, Any]],
+                 checkpoint: Path, checksum: str, ks: Tuple[int, ...]) -> Dict[str, Any]:
+    logging.info(f'{algorithm}: epoch sweep over {len(epochs)} values at vector size {vector_size}')
+    trials = [(algorithm, vector_size, epoch, min_count) for epoch in epochs]
+    run_rung(pool, trials, results, checkpoint, checksum, ks)
+    return max((results[trial] for trial in trials), key=lambda result: result[metric])
 
 
 def main():
-    with mp.Pool(6) as pool:
-        result = pool.map(f_tune_vector_word2vec, range(1, 101))
-        pd.DataFrame(result, columns=['Vector size', 'Correct']) \
-            .to_csv('.cache/tuning_vector_size_word2vec.csv', index=False)
-
-        result = pool.map(f_tune_iter_word2vec, range(1, 101))
-        pd.DataFrame(result, columns=['Iteration', 'Correct']) \
-            .to_csv('.cache/tuning_iteration_word2vec.csv', index=False)
-
-        result = pool.map(f_tune_vector_doc2vec, range(1, 101))
-        pd.DataFrame(result, columns=['Vector size', 'Correct']) \
-            .to_csv('.cache/tuning_vector_size_doc2vec.csv', index=False)
-
-        result = pool.map(f_tune_iter_doc2vec, range(1, 101))
-        pd.DataFrame(result, columns=['Iteration', 'Correct']) \
-            .to_csv('.cache/tuning_iteration_doc2vec.csv', index=False)
+    parser = argparse.ArgumentParser(
+        description='Successive halving search over vector size with epochs as the budget.')
+    parser.add_argument('--algorithms', default='word2vec,doc2vec')
+    parser.add_argument('--vector-sizes', default='5:101:5',
+                        help='start:stop:step range or comma separated list')
+    parser.add_argument('--min-epochs', type=int, default=5)
+    parser.add_argument('--max-epochs', type=int, default=40)
+    parser.add_argument('--eta', type=int, default=2, help='keep 1/eta configurations per rung')
+    parser.add_argument('--epochs', default='5:101:5',
+                        help='epoch values swept at the best vector size, start:stop:step range '
+                             'or comma separated list (empty to skip)')
+    parser.add_argument('--min-count', type=int, default=2)
+    parser.add_argument('--metric', default='hit@1')
+    parser.add_argument('--processes', type=int, default=6)
+    parser.add_argument('--workdir', default='.cache/tuning')
+    parser.add_argument('--checkpoint', default=None,
+                        help='JSON lines file of finished trials (default WORKDIR/trials.jsonl)')
+    args = parser.parse_args()
+
+    ks = (1, 5, 10)
+    algorithms = args.algorithms.split(',')
+    unknown = [algorithm for algorithm in algorithms if algorithm not in MODELS]
+    if unknown:
+        parser.error(f'Unknown algorithms: {", ".join(unknown)}')
+    vector_sizes = parse_range(args.vector_sizes)
+    epochs = parse_range(args.epochs) if args.epochs else []
+    budgets = rung_budgets(args.min_epochs, args.max_epochs, args.eta)
+
+    workdir = Path(args.workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    checkpoint = Path(args.checkpoint) if args.checkpoint else workdir / 'trials.jsonl'
+
+    dataset_store = Dataset()
+    df = dataset_store.load()
+    corpus_prefix, queries_prefix = workdir / 'corpus', workdir / 'queries'
+    TokenizedCorpus.from_texts(df['dataset']).save(corpus_prefix)
+    TokenizedCorpus.from_texts(df['Context']).save(queries_prefix)
+
+    results = load_checkpoint(checkpoint, dataset_store.checksum)
+    logging.info(f'Epoch budgets per rung: {budgets}')
+    best = {}
+    initargs = (df[['Response', 'dataset']], str(corpus_prefix), str(queries_prefix))
+    with mp.get_context('spawn').Pool(args.processes, initializer=init_worker,
+                                      initargs=initargs) as pool:
+        for algorithm in algorithms:
+            finalists = successive_halving(pool, algorithm, vector_sizes, budgets, args.eta,
+                                           args.metric, args.min_count, results,
+                                           checkpoint, dataset_store.checksum, ks)
+            best[algorithm] = finalists[0]
+            if epochs:
+                swept = sweep_epochs(pool, algorithm, finalists[0]['vector_size'], epochs,
+                                     args.metric, args.min_count, results,
+                                     checkpoint, dataset_store.checksum, ks)
+                best[algorithm] = max(finalists[0], swept, key=lambda result: result[args.metric])
+
+    pd.DataFrame(list(results.values())).sort_values(['algorithm', 'epochs', 'vector_size']) \
+        .to_csv(workdir / 'results.csv', index=False)
+    for algorithm, result in best.items():
+        print(f'{algorithm}: vector size {result["vector_size"]}, epochs {result["epochs"]}, '
+              f'{args.metric} {result[args.metric]:.4f}, mrr {result["mrr"]:.4f}')
 
 
 if __name__ == '__main__':
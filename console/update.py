@@ -0,0 +1,61 @@
+import argparse
+import logging
+from pathlib import Path
+
+from rc_modules import CacheStore, Dataset, Doc2vec, Tfidf, Word2vec
+
+logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s',
+                    level=logging.INFO)
+
+MODELS = {'tfidf': Tfidf, 'word2vec': Word2vec, 'doc2vec': Doc2vec}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Add or remove documents in the trained caches without retraining.')
+    parser.add_argument('--add', help='TSV file with the same columns as the dataset')
+    parser.add_argument('--remove', default='', help='comma separated document ids')
+    parser.add_argument('--compact', action='store_true',
+                        help='fold the pending changes into the caches (renumbers document ids)')
+    parser.add_argument('--models', default='tfidf,word2vec,doc2vec')
+    parser.add_argument('--cache', help='update the caches in this directory in place instead of '
+                                         'publishing a new version of the model store')
+    args = parser.parse_args()
+
+    names = args.models.split(',')
+    unknown = [name for name in names if name not in MODELS]
+    if unknown:
+        parser.error(f'Unknown models: {", ".join(unknown)}')
+    if not (args.add or args.remove or args.compact):
+        parser.error('Nothing to do, set --add, --remove and/or --compact')
+
+    documents = Dataset.read(Path(args.add)) if args.add else None
+    removed = [int(i) for i in args.remove.split(',') if i.strip()]
+    store, version = CacheStore(), None
+    if args.cache is None:
+        version = store.clone(store.current())
+        args.cache = str(store.path(version))
+
+    for name in names:
+        path = str(Path(args.cache, name))
+        model = MODELS[name](cache=path)
+        if documents is not None:
+            ids = model.add_documents(documents)
+            if len(ids) > 0:
+                logging.info(f'{name}: added documents {ids[0]} to {ids[-1]}')
+        if removed:
+            model.remove_documents(removed)
+            logging.info(f'{name}: removed {len(removed)} documents')
+        if args.compact:
+            model.compact(path)
+            logging.info(f'{name}: compacted to {len(model.responses)} documents')
+        else:
+            model.save_delta(path)
+
+    if version is not None:
+        store.publish(version)
+        logging.info(f'Published model cache version {version}')
+
+
+if __name__ == '__main__':
+    main()
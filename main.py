@@ -4,7 +4,7 @@ import os
 import pandas as pd
 import streamlit as st
 
-from rc_modules import Doc2vec, Proofing, Tfidf, Word2vec
+from rc_modules import CacheStore, Doc2vec, Ensemble, Proofing, Tfidf, Word2vec
 
 logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s',
                     level=logging.INFO)
@@ -23,9 +23,11 @@ def main():
     st.set_page_config(layout="wide")
     st.title('Sistem Question Answering Konstitusi Indonesia')
 
-    tfidf = Tfidf(cache='.cache/tfidf')
-    word2vec = Word2vec(cache='.cache/word2vec')
-    doc2vec = Doc2vec(cache='.cache/doc2vec')
+    store = CacheStore()
+    cache_path = store.path(store.current())
+    tfidf = Tfidf(cache=str(cache_path / 'tfidf'))
+    word2vec = Word2vec(cache=str(cache_path / 'word2vec'))
+    doc2vec = Doc2vec(cache=str(cache_path / 'doc2vec'))
 
     question = st.text_input(
         label='Masukkan pertanyaan tentang konsititusi',
@@ -33,6 +35,7 @@ def main():
     show_tfidf = st.checkbox('Tfidf', value=True)
     show_word2vec = st.checkbox('Word2vec', value=True)
     show_doc2vec = st.checkbox('Doc2vec', value=True)
+    show_fusion = st.checkbox('Gabungan (Reciprocal Rank Fusion)', value=False)
 
     if st.button('Tanyakan') or question != 'Apa tugas lembaga negara' and len(question) > 1:
         try:
@@ -45,25 +48,19 @@ def main():
             show_word2vec = False
             show_doc2vec = False
 
-        if show_tfidf:
-            answer: pd.DataFrame = tfidf.ask(
-                processed_question, num_rank=NUM_RANK)
+        selected = {name: model for name, model, show in (
+            ('Tfidf', tfidf, show_tfidf),
+            ('Word2vec', word2vec, show_word2vec),
+            ('Doc2vec', doc2vec, show_doc2vec)) if show}
+        if not selected:
+            return
+
+        rankings = Ensemble(selected).ask(
+            processed_question, num_rank=NUM_RANK, fuse=show_fusion)
+        for name, ranking in rankings.items():
+            answer: pd.DataFrame = ranking.to_dataframe()
             answer['Rank'] = answer.reset_index().index + 1
-            st.subheader('Tfidf')
-            st.table(answer[['Rank', 'Response', 'Similarity']])
-
-        if show_word2vec:
-            answer: pd.DataFrame = word2vec.ask(
-                processed_question, num_rank=NUM_RANK)
-            answer['Rank'] = answer.reset_index().index + 1
-            st.subheader('Word2vec')
-            st.table(answer[['Rank', 'Response', 'Similarity']])
-
-        if show_doc2vec:
-            answer: pd.DataFrame = doc2vec.ask(
-                processed_question, num_rank=NUM_RANK)
-            answer['Rank'] = answer.reset_index().index + 1
-            st.subheader('Doc2vec')
+            st.subheader('Gabungan' if name == 'fusion' else name)
             st.table(answer[['Rank', 'Response', 'Similarity']])
 
 
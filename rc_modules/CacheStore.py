@@ -0,0 +1,86 @@
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+
+class CacheStore:
+    """Versioned model cache directories with an atomically replaced CURRENT pointer."""
+
+    root_dir = Path(os.getenv('QA_MODEL_STORE', '.cache/models'))
+    legacy_dir = Path('.cache')
+    names = ('tfidf', 'word2vec', 'doc2vec')
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root) if root is not None else self.root_dir
+        self.pointer = Path(self.root, 'CURRENT')
+
+    def current(self) -> Optional[str]:
+        if not self.pointer.is_file():
+            return None
+        return self.pointer.read_text().strip() or None
+
+    def path(self, version: Optional[str]) -> Path:
+        # Caches trained before versioning live directly in .cache
+        if version is None:
+            return self.legacy_dir
+        return Path(self.root, version)
+
+    def versions(self) -> List[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+    def exist(self, version: str) -> bool:
+        return Path(self.root, version).is_dir()
+
+    def create(self) -> str:
+        self.root.mkdir(parents=True, exist_ok=True)
+        base = time.strftime('%Y%m%d-%H%M%S')
+        version, suffix = base, 0
+        while True:
+            try:
+                Path(self.root, version).mkdir()
+                return version
+            except FileExistsError:
+                suffix += 1
+                version = f'{base}-{suffix}'
+
+    def clone(self, version: Optional[str]) -> str:
+        clone = self.create()
+        for name in self.names:
+            source = Path(self.path(version), name)
+            if source.is_dir():
+                shutil.copytree(source, Path(self.root, clone, name))
+        return clone
+
+    def publish(self, version: str):
+        if not self.exist(version):
+            raise Exception(f'Cache version {version} not found')
+        tmp_path = self.pointer.with_name('.CURRENT.tmp')
+        tmp_path.write_text(f'{version}\n')
+        os.replace(tmp_path, self.pointer)
+
+    def prune(self, keep: int, loaded: Iterable[Optional[str]] = ()) -> List[str]:
+        """Remove all but the newest keep versions, never the current or loaded ones."""
+        protected = {self.current(), *loaded}
+        versions = self.versions()
+        removed = [version for version in versions[:max(len(versions) - keep, 0)]
+                   if version not in protected]
+        for version in removed:
+            shutil.rmtree(Path(self.root, version), ignore_errors=True)
+        return removed
+
+
+if __name__ == '__main__':
+    store = CacheStore()
+    if len(sys.argv) > 2 and sys.argv[1] == '--prune':
+        for version in store.prune(int(sys.argv[2])):
+            print(f'Removed {version}')
+    elif len(sys.argv) > 1:
+        store.publish(sys.argv[1])
+    current = store.current()
+    for version in store.versions():
+        print(f'{"*" if version == current else " "} {version}')
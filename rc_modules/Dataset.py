@@ -0,0 +1,93 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import requests
+
+from .Storage import StringColumn
+
+logger = logging.getLogger(__name__)
+
+
+class Dataset:
+    """Question/answer dataset kept as string columns keyed by the source sha256."""
+
+    source_file = Path(os.getenv('QA_DATASET', '.cache/dataset.csv'))
+    source_url = 'https://raw.githubusercontent.com/rochimfn/' + \
+        'tanyahukum-bot/main/dataset.csv'
+    store_dir = Path('.cache/dataset')
+    columns = ('Context', 'Keywords', 'Response')
+    dataset_key = 'dataset'
+
+    def __init__(self, source: Optional[str] = None, store: Optional[str] = None):
+        self.source = Path(source) if source is not None else self.source_file
+        self.store = Path(store) if store is not None else self.store_dir
+        self.checksum: Optional[str] = None
+
+    def __download(self):
+        r = requests.get(self.source_url)
+        if r.status_code != 200:
+            raise Exception(f'Fail to download dataset from {self.source_url}')
+        self.source.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.source, 'wb') as f:
+            f.write(r.content)
+
+    def __checksum(self) -> str:
+        digest = hashlib.sha256()
+        with open(self.source, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def __read_meta(self) -> dict:
+        meta_path = Path(self.store, 'meta.json')
+        if not meta_path.is_file():
+            return {}
+        with open(meta_path, 'r') as f:
+            return json.loads(f.read())
+
+    @classmethod
+    def read(cls, source: Path) -> pd.DataFrame:
+        df = pd.read_csv(source, sep='\t', quotechar='\'')
+        missing = [column for column in cls.columns if column not in df]
+        if missing:
+            raise Exception(f'Dataset {source} has no column {", ".join(missing)}')
+        df = df[list(cls.columns)].fillna('').astype(str)
+        df[cls.dataset_key] = df['Context'] + ' ' + df['Keywords'] + ' ' + df['Response']
+        return df
+
+    def __save(self, df: pd.DataFrame):
+        self.store.mkdir(parents=True, exist_ok=True)
+        Path(self.store, 'meta.json').unlink(missing_ok=True)
+        for column in df.columns:
+            StringColumn.from_strings(df[column]).save(Path(self.store, column))
+        meta = {'sha256': self.checksum,
+                'source': str(self.source),
+                'rows': len(df),
+                'columns': list(df.columns)}
+        with open(Path(self.store, 'meta.json'), 'w') as f:
+            f.write(json.dumps(meta, indent=2))
+
+    def __load_store(self, meta: dict) -> pd.DataFrame:
+        return pd.DataFrame({column: StringColumn.load(Path(self.store, column)).to_list()
+                             for column in meta['columns']})
+
+    def load(self) -> pd.DataFrame:
+        if not self.source.is_file():
+            if self.source != self.source_file:
+                raise Exception(f'Dataset {self.source} not found')
+            self.__download()
+
+        self.checksum = self.__checksum()
+        meta = self.__read_meta()
+        if meta.get('sha256') == self.checksum:
+            return self.__load_store(meta)
+
+        logger.info(f'Building dataset store {self.store} from {self.source}')
+        df = self.read(self.source)
+        self.__save(df)
+        return df
@@ -0,0 +1,154 @@
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse, vstack
+
+from .Ranking import Ranking
+from .Storage import StringColumn, array_path, csr_exist, load_csr, save_array, save_csr
+
+Rows = Union[np.ndarray, csr_matrix]
+
+
+class DeltaResponses(Sequence):
+    """Cached responses followed by the responses of appended documents."""
+
+    def __init__(self, base: Sequence[str], appended: List[str]):
+        self.base = base
+        self.appended = appended
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.appended)
+
+    def __getitem__(self, index: Union[int, np.integer]) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('DeltaResponses index out of range')
+        if index < len(self.base):
+            return self.base[index]
+        return self.appended[index - len(self.base)]
+
+
+class Delta:
+    """Documents appended to or removed from a model since its cache was built.
+
+    Appended documents take the ids after the cached ones and removed documents
+    stay as tombstones, so ids are stable until the delta is folded back in.
+    """
+
+    def __init__(self, base_size: int, rows: Optional[Rows] = None,
+                 responses: Optional[List[str]] = None, removed: Optional[np.ndarray] = None):
+        self.base_size = base_size
+        self.rows = rows
+        self.responses: List[str] = list(responses) if responses is not None else []
+        self.removed = removed if removed is not None else np.empty(0, dtype=np.int64)
+
+    @property
+    def size(self) -> int:
+        return self.base_size + len(self.responses)
+
+    def empty(self) -> bool:
+        return not self.responses and self.removed.shape[0] == 0
+
+    def ids(self) -> np.ndarray:
+        return np.arange(self.base_size, self.size, dtype=np.int64)
+
+    def add(self, rows: Rows, responses: Sequence[str]) -> np.ndarray:
+        if rows.shape[0] != len(responses):
+            raise Exception('Rows and responses must have the same length')
+        ids = np.arange(self.size, self.size + len(responses), dtype=np.int64)
+        if self.rows is None:
+            self.rows = rows
+        elif issparse(rows):
+            self.rows = vstack([self.rows, rows], format='csr')
+        else:
+            self.rows = np.vstack([self.rows, rows])
+        self.responses.extend(responses)
+        return ids
+
+    def remove(self, ids: Sequence[int]):
+        ids = np.asarray(ids, dtype=np.int64).reshape((-1,))
+        if ids.shape[0] > 0 and (ids.min() < 0 or ids.max() >= self.size):
+            raise Exception('Document id out of range')
+        self.removed = np.union1d(self.removed, ids)
+
+    def view(self, responses: Sequence[str]) -> Sequence[str]:
+        if isinstance(responses, DeltaResponses) or not self.responses:
+            return responses
+        return DeltaResponses(responses, self.responses)
+
+    def merge_scores(self, scores: np.ndarray, appended: Optional[np.ndarray]) -> np.ndarray:
+        """Scores of all documents along the last axis, -inf for removed ones."""
+        if appended is not None:
+            scores = np.concatenate((scores, appended), axis=-1)
+        if self.removed.shape[0] > 0:
+            scores[..., self.removed] = -np.inf
+        return scores
+
+    def merge_candidates(self, candidates: np.ndarray, scores: np.ndarray,
+                         appended: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        if appended is not None:
+            candidates = np.concatenate((candidates, self.ids()))
+            scores = np.concatenate((scores, appended))
+        if self.removed.shape[0] > 0:
+            keep = ~np.isin(candidates, self.removed)
+            candidates, scores = candidates[keep], scores[keep]
+        return candidates, scores
+
+    def drop_removed(self, ranking: Ranking) -> Ranking:
+        if self.removed.shape[0] == 0:
+            return ranking
+        keep = ranking.scores > -np.inf
+        return Ranking(indices=ranking.indices[keep],
+                       scores=ranking.scores[keep],
+                       responses=[response for response, k in zip(ranking.responses, keep) if k])
+
+    def fold(self, rows: Rows, responses: Sequence[str]) -> Tuple[Rows, List[str]]:
+        """Cached rows and responses with the delta applied; ids are renumbered."""
+        if isinstance(responses, DeltaResponses):
+            responses = responses.base
+        if self.rows is not None:
+            rows = vstack([rows, self.rows], format='csr') if issparse(rows) \
+                else np.vstack([rows, self.rows])
+        responses = responses.to_list() if isinstance(responses, StringColumn) else list(responses)
+        responses.extend(self.responses)
+
+        keep = np.ones(self.size, dtype=bool)
+        keep[self.removed] = False
+        keep = np.flatnonzero(keep)
+        return rows[keep], [responses[i] for i in keep]
+
+    @classmethod
+    def exist(cls, prefix: Path) -> bool:
+        return array_path(prefix, 'removed').is_file()
+
+    @classmethod
+    def load(cls, prefix: Path, base_size: int) -> 'Delta':
+        if int(np.load(array_path(prefix, 'base_size'))) != base_size:
+            raise Exception(f'Delta {prefix} does not match the cached documents')
+
+        rows = None
+        if csr_exist(Path(f'{prefix}_rows')):
+            rows = csr_matrix(load_csr(Path(f'{prefix}_rows')), copy=True)
+        elif array_path(prefix, 'rows').is_file():
+            rows = np.load(array_path(prefix, 'rows'))
+        responses = StringColumn.load(Path(f'{prefix}_responses')).to_list()
+        if (0 if rows is None else rows.shape[0]) != len(responses):
+            raise Exception(f'Delta {prefix} is incomplete')
+        return cls(base_size, rows, responses, np.load(array_path(prefix, 'removed')))
+
+    def save(self, prefix: Path):
+        save_array(array_path(prefix, 'base_size'), np.array(self.base_size))
+        if issparse(self.rows):
+            save_csr(Path(f'{prefix}_rows'), self.rows)
+        elif self.rows is not None:
+            save_array(array_path(prefix, 'rows'), self.rows)
+        StringColumn.from_strings(self.responses).save(Path(f'{prefix}_responses'))
+        save_array(array_path(prefix, 'removed'), self.removed)
+
+    @classmethod
+    def delete(cls, prefix: Path):
+        array_path(prefix, 'removed').unlink(missing_ok=True)
+        for path in prefix.parent.glob(f'{prefix.name}_*.npy'):
+            path.unlink()
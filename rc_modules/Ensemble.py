@@ -0,0 +1,28 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from .Preprocessing import Query, as_tokens
+from .Ranking import Ranking, reciprocal_rank_fusion
+
+logger = logging.getLogger(__name__)
+
+
+class Ensemble:
+    def __init__(self, models: Dict[str, Any]):
+        self.models = models
+
+    def ask(self, query: Query, num_rank=10, fuse=False,
+            fusion_depth: Optional[int] = None) -> Dict[str, Ranking]:
+        tokens = as_tokens(query)
+        depth = max(num_rank, fusion_depth or num_rank) if fuse else num_rank
+        with ThreadPoolExecutor(max_workers=len(self.models)) as pool:
+            futures = {name: pool.submit(model.ask, tokens, depth)
+                       for name, model in self.models.items()}
+            rankings = {name: future.result() for name, future in futures.items()}
+
+        answers = {name: ranking.head(num_rank) for name, ranking in rankings.items()}
+        if fuse:
+            answers['fusion'] = reciprocal_rank_fusion(
+                list(rankings.values()), num_rank)
+        return answers
@@ -0,0 +1,74 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .Preprocessing import Query
+
+Relevant = Sequence[Union[int, Sequence[int]]]
+
+
+class Evaluation(NamedTuple):
+    query_ids: np.ndarray
+    doc_ids: np.ndarray
+    ranks: np.ndarray
+    gold_ranks: np.ndarray
+
+    def metrics(self, ks: Sequence[int] = (1, 5, 10)) -> Dict[str, float]:
+        results = {'queries': len(self.gold_ranks),
+                   'mrr': float(np.mean(1.0 / self.gold_ranks)),
+                   'mean_rank': float(np.mean(self.gold_ranks)),
+                   'median_rank': float(np.median(self.gold_ranks))}
+        num_relevant = np.bincount(self.query_ids, minlength=len(self.gold_ranks))
+        for k in ks:
+            hit = self.gold_ranks <= k
+            found = np.bincount(self.query_ids[self.ranks <= k],
+                                minlength=len(self.gold_ranks))
+            results[f'mrr@{k}'] = float(np.mean(np.where(hit, 1.0 / self.gold_ranks, 0.0)))
+            results[f'hit@{k}'] = float(np.mean(hit))
+            results[f'recall@{k}'] = float(np.mean(found / num_relevant))
+        return results
+
+
+def relevant_pairs(relevant: Relevant) -> Tuple[np.ndarray, np.ndarray]:
+    query_ids, doc_ids = [], []
+    for query_id, docs in enumerate(relevant):
+        docs = [docs] if np.isscalar(docs) else list(docs)
+        if not docs:
+            raise Exception(f'Query {query_id} has no relevant document')
+        query_ids.extend([query_id] * len(docs))
+        doc_ids.extend(docs)
+    return np.array(query_ids, dtype=np.int64), np.array(doc_ids, dtype=np.int64)
+
+
+def evaluate(model: Any, queries: List[Query], relevant: Optional[Relevant] = None,
+             block_size: Optional[int] = None, max_block_elements: int = 1 << 25) -> Evaluation:
+    if relevant is None:
+        relevant = range(len(queries))
+    if len(relevant) != len(queries):
+        raise Exception('Queries and relevant documents must have the same length')
+
+    query_ids, doc_ids = relevant_pairs(relevant)
+    num_docs = len(model.responses)
+    if block_size is None:
+        block_size = max(1, max_block_elements // max(num_docs, 1))
+
+    ranks = np.empty(len(query_ids), dtype=np.int64)
+    pair_starts = np.searchsorted(query_ids, np.arange(0, len(queries) + 1))
+    for start in range(0, len(queries), block_size):
+        end = min(start + block_size, len(queries))
+        scores = model.score_batch(queries[start:end])
+        pairs = slice(pair_starts[start], pair_starts[end])
+        rows = query_ids[pairs] - start
+        # A relevant document the model does not have (e.g. more test questions
+        # than documents after update.py --remove) ranks after every document.
+        known = (doc_ids[pairs] >= 0) & (doc_ids[pairs] < num_docs)
+        relevant_scores = scores[rows, np.where(known, doc_ids[pairs], 0)]
+        # Ties count against the relevant document (the >= includes itself),
+        # so a query scoring every document equally ranks it last, not first.
+        ranks[pairs] = np.where(known, np.count_nonzero(
+            scores[rows] >= relevant_scores[:, np.newaxis], axis=1), num_docs + 1)
+
+    gold_ranks = np.minimum.reduceat(ranks, pair_starts[:-1]) if len(ranks) else ranks
+    return Evaluation(query_ids=query_ids, doc_ids=doc_ids,
+                      ranks=ranks, gold_ranks=gold_ranks)
+
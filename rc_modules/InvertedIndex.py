@@ -0,0 +1,92 @@
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix
+
+from .Storage import array_path, save_array
+
+
+class InvertedIndex:
+    """Term -> (doc id, weight) postings with MaxScore top-k pruning."""
+
+    def __init__(self, offsets: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray,
+                 max_weights: np.ndarray, num_docs: int):
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.max_weights = max_weights
+        self.num_docs = num_docs
+
+    @classmethod
+    def build(cls, matrix: csr_matrix) -> 'InvertedIndex':
+        postings = csc_matrix(matrix)
+        postings.sort_indices()
+        max_weights = postings.max(axis=0).toarray().reshape((-1,))
+        return cls(postings.indptr.astype(np.int64), postings.indices,
+                   postings.data, max_weights, matrix.shape[0])
+
+    def __postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.offsets[term], self.offsets[term + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+    def search(self, query_vec: csr_matrix, num_rank: int) -> Tuple[np.ndarray, np.ndarray]:
+        terms, query_weights = query_vec.indices, query_vec.data
+        bounds = query_weights * self.max_weights[terms]
+        order = np.argsort(bounds)[::-1]
+        terms, query_weights, bounds = terms[order], query_weights[order], bounds[order]
+        remaining = np.append(np.cumsum(bounds[::-1])[::-1], 0)[1:]
+
+        candidates = np.empty(0, dtype=np.int64)
+        scores = np.empty(0, dtype=np.float64)
+        accept_new = True
+        for term, query_weight, rest in zip(terms, query_weights, remaining):
+            doc_ids, weights = self.__postings(term)
+            if accept_new:
+                merged, inverse = np.unique(np.concatenate((candidates, doc_ids)),
+                                            return_inverse=True)
+                scores = np.bincount(inverse.reshape((-1,)), minlength=merged.shape[0],
+                                     weights=np.concatenate((scores, query_weight * weights)))
+                candidates = merged
+            elif doc_ids.shape[0] > 0:
+                pos = np.minimum(np.searchsorted(doc_ids, candidates),
+                                 doc_ids.shape[0] - 1)
+                hit = doc_ids[pos] == candidates
+                scores[hit] += query_weight * weights[pos[hit]]
+
+            if candidates.shape[0] >= num_rank > 0:
+                threshold = np.partition(
+                    scores, candidates.shape[0] - num_rank)[candidates.shape[0] - num_rank]
+                # A document not seen yet can score at most `rest`.
+                accept_new = accept_new and rest >= threshold
+                if not accept_new:
+                    keep = scores + rest >= threshold
+                    candidates, scores = candidates[keep], scores[keep]
+
+        missing = num_rank - candidates.shape[0]
+        if missing > 0:
+            padding = np.setdiff1d(np.arange(min(self.num_docs, num_rank + candidates.shape[0])),
+                                   candidates)[:missing]
+            candidates = np.concatenate((candidates, padding))
+            scores = np.concatenate((scores, np.zeros(padding.shape[0])))
+
+        return candidates, scores
+
+    @classmethod
+    def exist(cls, prefix: Path) -> bool:
+        return all(array_path(prefix, name).is_file()
+                   for name in ('offsets', 'doc_ids', 'weights', 'max_weights'))
+
+    @classmethod
+    def load(cls, prefix: Path, num_docs: int) -> 'InvertedIndex':
+        return cls(np.load(array_path(prefix, 'offsets'), mmap_mode='r'),
+                   np.load(array_path(prefix, 'doc_ids'), mmap_mode='r'),
+                   np.load(array_path(prefix, 'weights'), mmap_mode='r'),
+                   np.load(array_path(prefix, 'max_weights'), mmap_mode='r'),
+                   num_docs)
+
+    def save(self, prefix: Path):
+        save_array(array_path(prefix, 'offsets'), self.offsets)
+        save_array(array_path(prefix, 'doc_ids'), self.doc_ids)
+        save_array(array_path(prefix, 'weights'), self.weights)
+        save_array(array_path(prefix, 'max_weights'), self.max_weights)
@@ -0,0 +1,82 @@
+import logging
+from pathlib import Path
+
+import numpy as np
+from sklearn.preprocessing import normalize
+
+from .Storage import array_path, save_array
+
+logger = logging.getLogger(__name__)
+
+
+class IvfIndex:
+    """Inverted file index over L2-normalized vectors (spherical k-means)."""
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, ids: np.ndarray):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, num_lists: int, iterations: int = 20,
+              sample_size: int = 256, seed: int = 0) -> 'IvfIndex':
+        num_lists = max(1, min(num_lists, vectors.shape[0]))
+        rng = np.random.default_rng(seed)
+
+        sample = vectors
+        if vectors.shape[0] > num_lists * sample_size:
+            sample = vectors[rng.choice(
+                vectors.shape[0], num_lists * sample_size, replace=False)]
+        sample = np.asarray(sample, dtype=np.float32)
+
+        centroids = sample[rng.choice(
+            sample.shape[0], num_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = cls.__assign(sample, centroids)
+            for list_id in range(num_lists):
+                members = sample[assignment == list_id]
+                if members.shape[0] > 0:
+                    centroids[list_id] = members.sum(axis=0)
+            centroids = normalize(centroids).astype(np.float32)
+        logger.info(f'IVF index trained with {num_lists} lists')
+
+        assignment = cls.__assign(vectors, centroids)
+        ids = np.argsort(assignment, kind='stable').astype(np.int64)
+        offsets = np.zeros(num_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=num_lists), out=offsets[1:])
+        return cls(centroids, offsets, ids)
+
+    @staticmethod
+    def __assign(vectors: np.ndarray, centroids: np.ndarray, block_size: int = 65536) -> np.ndarray:
+        assignment = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], block_size):
+            block = np.asarray(vectors[start:start + block_size])
+            assignment[start:start + block_size] = np.argmax(
+                block @ centroids.T, axis=1)
+        return assignment
+
+    def search(self, query_vec: np.ndarray, nprobe: int, min_candidates: int = 1) -> np.ndarray:
+        list_scores = self.centroids @ query_vec
+        order = np.argsort(list_scores)[::-1]
+        sizes = np.cumsum(np.diff(self.offsets)[order])
+        enough = int(np.searchsorted(sizes, min_candidates)) + 1
+        probes = order[:max(nprobe, enough)]
+
+        return np.concatenate([self.ids[self.offsets[i]:self.offsets[i + 1]]
+                               for i in probes])
+
+    @classmethod
+    def exist(cls, prefix: Path) -> bool:
+        return all(array_path(prefix, name).is_file()
+                   for name in ('centroids', 'offsets', 'ids'))
+
+    @classmethod
+    def load(cls, prefix: Path) -> 'IvfIndex':
+        return cls(np.load(array_path(prefix, 'centroids'), mmap_mode='r'),
+                   np.load(array_path(prefix, 'offsets'), mmap_mode='r'),
+                   np.load(array_path(prefix, 'ids'), mmap_mode='r'))
+
+    def save(self, prefix: Path):
+        save_array(array_path(prefix, 'centroids'), self.centroids)
+        save_array(array_path(prefix, 'offsets'), self.offsets)
+        save_array(array_path(prefix, 'ids'), self.ids)
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LruCache:
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.__data: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.__lock:
+            if key in self.__data:
+                value, expires_at = self.__data[key]
+                if expires_at is None or expires_at > time.monotonic():
+                    self.hits += 1
+                    self.__data.move_to_end(key)
+                    return value
+                del self.__data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[Hashable], Any]) -> Any:
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute(key)
+            self.put(key, value)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize < 1:
+            return
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        with self.__lock:
+            self.__data[key] = (value, expires_at)
+            self.__data.move_to_end(key)
+            while len(self.__data) > self.maxsize:
+                self.__data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__data.clear()
+
+    def __len__(self) -> int:
+        return len(self.__data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'size': len(self.__data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations}
@@ -0,0 +1,173 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_local = threading.local()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    timings: Optional[Dict[str, float]] = getattr(_local, 'timings', None)
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def record_stages() -> Iterator[Dict[str, float]]:
+    previous = getattr(_local, 'timings', None)
+    _local.timings = {}
+    try:
+        yield _local.timings
+    finally:
+        _local.timings = previous
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.values: Dict[Labels, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = _labels(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            return [f'{self.name}{_format_labels(k)} {_format_value(v)}'
+                    for k, v in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str,
+                 callback: Optional[Callable[[], List[Tuple[Dict[str, str], float]]]] = None):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def set(self, value: float, **labels: str):
+        with self.lock:
+            self.values[_labels(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            values = {_labels(labels): value for labels, value in self.callback()}
+            with self.lock:
+                self.values = values
+        return super().samples()
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = _labels(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            counts, total = self.values[key]
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self.lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), counts):
+                    cumulative += count
+                    le = (('le', _format_value(bound)),)
+                    lines.append(f'{self.name}_bucket{_format_labels(key, le)} {cumulative}')
+                lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(total[0])}')
+                lines.append(f'{self.name}_count{_format_labels(key)} {cumulative}')
+        return lines
+
+
+class Metrics:
+    """Registry of counters, gauges and histograms rendered as Prometheus text."""
+
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+
+    def __register(self, metric):
+        if metric.name in self.metrics:
+            raise Exception(f'Metric {metric.name} already registered')
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self.__register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str,
+              callback: Optional[Callable[[], List[Tuple[Dict[str, str], float]]]] = None) -> Gauge:
+        return self.__register(Gauge(name, documentation, callback))
+
+    def histogram(self, name: str, documentation: str,
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.__register(Histogram(name, documentation, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,89 @@
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Union
+
+import numpy as np
+
+from .Storage import StringColumn, array_path, save_array, string_column
+
+Query = Union[str, List[str]]
+
+
+# Same pattern as the TfidfVectorizer default, so article and year numbers
+# such as "33" or "1945" stay searchable.
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def as_tokens(query: Query) -> List[str]:
+    if isinstance(query, list):
+        return query
+    if isinstance(query, str):
+        return tokenize(query)
+    raise Exception("Wrong query data type! Use 'str' or <class 'list'>")
+
+
+def identity(tokens: List[str]) -> List[str]:
+    return tokens
+
+
+class TokenizedCorpus(Sequence):
+    """Corpus tokenized once and kept as token-id arrays over a vocabulary."""
+
+    def __init__(self, vocabulary: Sequence[str], ids: np.ndarray, offsets: np.ndarray):
+        self.vocabulary = vocabulary
+        self.ids = ids
+        self.offsets = offsets
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str]) -> 'TokenizedCorpus':
+        token_ids: Dict[str, int] = {}
+        ids: List[int] = []
+        offsets = [0]
+        for text in texts:
+            ids.extend(token_ids.setdefault(token, len(token_ids))
+                       for token in tokenize(text))
+            offsets.append(len(ids))
+        return cls(list(token_ids), np.array(ids, dtype=np.int32),
+                   np.array(offsets, dtype=np.int64))
+
+    @classmethod
+    def exist(cls, prefix: Path) -> bool:
+        return StringColumn.exist(Path(f'{prefix}_vocabulary')) \
+            and array_path(prefix, 'ids').is_file() \
+            and array_path(prefix, 'offsets').is_file()
+
+    @classmethod
+    def load(cls, prefix: Path) -> 'TokenizedCorpus':
+        vocabulary = StringColumn.load(Path(f'{prefix}_vocabulary'))
+        return cls(vocabulary,
+                   np.load(array_path(prefix, 'ids'), mmap_mode='r'),
+                   np.load(array_path(prefix, 'offsets'), mmap_mode='r'))
+
+    def save(self, prefix: Path):
+        string_column(self.vocabulary).save(Path(f'{prefix}_vocabulary'))
+        save_array(array_path(prefix, 'ids'), self.ids)
+        save_array(array_path(prefix, 'offsets'), self.offsets)
+
+    def documents(self) -> List[List[str]]:
+        vocabulary = list(self.vocabulary)
+        ids = self.ids.tolist()
+        offsets = self.offsets.tolist()
+        return [[vocabulary[i] for i in ids[start:end]]
+                for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def document_ids(self, index: int) -> np.ndarray:
+        return self.ids[self.offsets[index]:self.offsets[index + 1]]
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> List[str]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('TokenizedCorpus index out of range')
+        return [self.vocabulary[i] for i in self.document_ids(index)]
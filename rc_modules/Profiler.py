@@ -0,0 +1,46 @@
+import cProfile
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Tuple
+
+
+class Profiler:
+    """cProfile wrapper for single calls, rate limited to one profile per interval."""
+
+    def __init__(self, directory: Path = Path('.cache/profiles'), interval: float = 60.0):
+        self.directory = directory
+        self.interval = interval
+        self.last: float = float('-inf')
+        self.lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last < self.interval:
+                return False
+            self.last = now
+            return True
+
+    @staticmethod
+    def slug(text: str, max_length: int = 40) -> str:
+        return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')[:max_length] or 'empty'
+
+    def run(self, name: str, query: str, func: Callable[[], Any]) -> Tuple[Any, Path]:
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            result = func()
+        finally:
+            profile.disable()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        path = Path(self.directory,
+                    f'{timestamp}_{name}_{self.slug(query)}_{elapsed_ms:.0f}ms.prof')
+        profile.dump_stats(str(path))
+        return result, path
@@ -1,37 +1,54 @@
 import json
-from difflib import get_close_matches
+import os
+import threading
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, FrozenSet, List, Optional, Tuple
 
 import requests
-from gensim.utils import simple_preprocess
 from Sastrawi.Stemmer.StemmerFactory import StemmerFactory
 
+from .LruCache import LruCache
+from .Metrics import stage
+from .Preprocessing import tokenize
+from .SpellingIndex import SpellingIndex
+
 
 class Proofing:
     dict_file = Path('.cache/dictionary.txt')
     dict_url = 'https://raw.githubusercontent.com/rochimfn/' + \
                'dataset-qa/main/manual-kamus-indonesia.txt'
-    dict: Optional[List[str]] = None
+    dict: Optional[FrozenSet[str]] = None
+
+    spelling_file = Path('.cache/dictionary.spelling')
+    spelling: Optional[SpellingIndex] = None
 
     custom_dict_file = Path('.cache/custom_dict.json')
     custom_dict_url = 'https://raw.githubusercontent.com/rochimfn/' + \
         'dataset-qa/main/custom_dict.json'
-    custom_dict: Optional[List[str]] = None
+    custom_dict: Optional[Dict[str, str]] = None
 
     context_dict_file = Path('.cache/konstitusi.json')
     context_dict_url = 'https://raw.githubusercontent.com/rochimfn/' + \
         'dataset-qa/main/konstitusi.json'
-    context_dict: Optional[List[str]] = None
+    context_dict: Optional[FrozenSet[str]] = None
 
     factory = StemmerFactory()
     stemmer = factory.create_stemmer()
 
+    cache_size = int(os.getenv('PROOFING_CACHE_SIZE', 4096))
+    stem_cache = LruCache(cache_size)
+    check_cache = LruCache(cache_size)
+
+    lock = threading.Lock()
+
     def __init__(self):
-        if not (self.dict_file.is_file() and self.custom_dict_file.is_file()
-                and self.context_dict_file.is_file()):
-            self.__download_dict()
-        self.__load_dict()
+        with Proofing.lock:
+            if Proofing.dict is not None:
+                return
+            if not (self.dict_file.is_file() and self.custom_dict_file.is_file()
+                    and self.context_dict_file.is_file()):
+                self.__download_dict()
+            self.__load_dict()
 
     def __download_dict(self):
         r = requests.get(self.dict_url)
@@ -51,79 +68,70 @@ class Proofing:
 
     def __load_dict(self):
         with open(self.dict_file, 'r') as f:
-            self.dict = f.read().split('\n')
+            dict_words = f.read().split('\n')
         with open(self.custom_dict_file, 'r') as f:
-            self.custom_dict = json.loads(f.read())
+            custom_dict = json.loads(f.read())
         with open(self.context_dict_file, 'r') as f:
-            self.context_dict = json.loads(f.read())
+            context_dict = json.loads(f.read())
+
+        Proofing.spelling = SpellingIndex.load_or_build(
+            self.spelling_file, dict_words)
+        Proofing.custom_dict = custom_dict
+        Proofing.context_dict = frozenset(context_dict)
+        Proofing.dict = frozenset(dict_words)
+        Proofing.check_cache.clear()
+
+    @classmethod
+    def configure_cache(cls, cache_size: int):
+        cls.cache_size = cache_size
+        cls.stem_cache = LruCache(cache_size)
+        cls.check_cache = LruCache(cache_size)
+
+    @classmethod
+    def cache_info(cls) -> Dict[str, Dict[str, int]]:
+        return {'stem': cls.stem_cache.stats(),
+                'check': cls.check_cache.stats()}
 
     def suggest(self, word: str) -> List[Optional[str]]:
-        dict_subset = [w for w in self.dict if w.startswith(word[0])]
-        return get_close_matches(word, dict_subset, cutoff=0.8)
+        return self.spelling.lookup(word, cutoff=0.8)
 
     def check_word(self, word: str) -> str:
         if len(word) == 0:
             raise ValueError('Kata tidak boleh kosong!')
 
-        if word.lower() in self.custom_dict:
-            return self.custom_dict[word]
-        elif word.lower() in self.dict or self.stemmer.stem(word.lower()) in self.dict:
-            return word.lower()
+        found, result = self.check_cache.get_or_compute(
+            word.lower(), self.__lookup_word)
+        if found:
+            return result
         else:
-            suggestion = ', '.join(self.suggest(word.lower()))
             raise ValueError(
-                f'Kata "{word}" tidak ditemukan! \nMungkin maksud anda: {suggestion}')
+                f'Kata "{word}" tidak ditemukan! \nMungkin maksud anda: {result}')
+
+    def __lookup_word(self, word_lower: str) -> Tuple[bool, str]:
+        if word_lower in self.custom_dict:
+            return True, self.custom_dict[word_lower]
+        elif word_lower in self.dict or self.stem(word_lower) in self.dict:
+            return True, word_lower
+        else:
+            return False, ', '.join(self.suggest(word_lower))
+
+    def stem(self, word: str) -> str:
+        return self.stem_cache.get_or_compute(word, self.stemmer.stem)
 
     def check_words(self, words: str) -> str:
         if len(words) == 0:
             return ''
-        if self.__fit_context(words):
-            return ' '.join([self.check_word(word) for word in simple_preprocess(words)])
-        else:
-            raise ValueError(
-                f'"{words}" terdeteksi bukan pertanyaan tentang konstitusi Indonesia.')
+        with stage('proofing'):
+            if self.__fit_context(words):
+                return ' '.join([word if self.__is_number(word) else self.check_word(word)
+                                 for word in tokenize(words)])
+        raise ValueError(
+            f'"{words}" terdeteksi bukan pertanyaan tentang konstitusi Indonesia.')
+
+    @staticmethod
+    def __is_number(word: str) -> bool:
+        return any(c.isdigit() for c in word)
 
     def __fit_context(self, question: str) -> bool:
-        fit = False
-        for word in simple_preprocess(question):
-            if word in self.context_dict:
-                fit = True
-                break
-
-        return fit
-
-
-if __name__ == '__main__':
-    p = Proofing()
-    print(f'Length of dictionary {len(p.dict)}')
-
-    word = 'Pulang'
-    print(f'Word {word} in dictionary: {p.check_word(word)}')
-
-    false_word = 'Pulagn'
-    try:
-        print(f'Word {false_word} in dictionary: {p.check_word(false_word)}')
-    except ValueError as e:
-        print(e.args[0])
-
-    sentence = 'Bapak pulang kampung'
-    print(f'Kalimat : {sentence}')
-    print(f'Hasil: {p.check_words(sentence)}')
-
-    try:
-        false_sentence = 'Bapak pulagn kampung'
-        print(f'Kalimat : {false_sentence}')
-        print(f'Hasil: {p.check_words(false_sentence)}')
-    except ValueError as e:
-        print(e.args[0])
-
-    another_sentence = 'bgmn bisa'
-    print(f'Kalimat : {another_sentence}')
-    print(f'Hasil: {p.check_words(another_sentence)}')
-
-    try:
-        another_false_sentence = 'bg bisa'
-        print(f'Kalimat : {another_false_sentence}')
-        print(f'Hasil: {p.check_words(another_false_sentence)}')
-    except ValueError as e:
-        print(e.args[0])
+        return not self.context_dict.isdisjoint(tokenize(question))
+
@@ -0,0 +1,75 @@
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class Ranking(NamedTuple):
+    indices: np.ndarray
+    scores: np.ndarray
+    responses: List[str]
+
+    def head(self, num_rank: int) -> 'Ranking':
+        return Ranking(indices=self.indices[:num_rank],
+                       scores=self.scores[:num_rank],
+                       responses=self.responses[:num_rank])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame({'Response': self.responses,
+                             'Similarity': self.scores},
+                            index=self.indices)
+
+
+def top_k_batch(scores: np.ndarray, num_rank: int) -> np.ndarray:
+    num_query, size = scores.shape
+    num_rank = min(num_rank, size)
+    if num_rank < 1:
+        return np.empty((num_query, 0), dtype=np.intp)
+
+    if num_rank < size:
+        top_idx = np.argpartition(
+            scores, size - num_rank, axis=1)[:, size - num_rank:]
+    else:
+        top_idx = np.tile(np.arange(size), (num_query, 1))
+
+    top_scores = np.take_along_axis(scores, top_idx, axis=1)
+    order = np.argsort(top_scores, axis=1)[:, ::-1]
+    return np.take_along_axis(top_idx, order, axis=1)
+
+
+def top_k(scores: np.ndarray, num_rank: int) -> np.ndarray:
+    return top_k_batch(scores.reshape((1, -1)), num_rank)[0]
+
+
+def rank(scores: np.ndarray, responses: Sequence[str], num_rank: int = 10,
+         candidates: Optional[np.ndarray] = None) -> Ranking:
+    top_idx = top_k(scores, num_rank)
+    top_scores = scores[top_idx]
+    if candidates is not None:
+        top_idx = candidates[top_idx]
+    return Ranking(indices=top_idx,
+                   scores=top_scores,
+                   responses=[responses[i] for i in top_idx])
+
+
+def rank_batch(scores: np.ndarray, responses: Sequence[str], num_rank: int = 10) -> List[Ranking]:
+    top_idx = top_k_batch(scores, num_rank)
+    top_scores = np.take_along_axis(scores, top_idx, axis=1)
+    return [Ranking(indices=indices,
+                    scores=query_scores,
+                    responses=[responses[i] for i in indices])
+            for indices, query_scores in zip(top_idx, top_scores)]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Ranking], num_rank: int = 10, k: int = 60) -> Ranking:
+    scores: Dict[int, float] = {}
+    responses: Dict[int, str] = {}
+    for ranking in rankings:
+        for position, (index, response) in enumerate(zip(ranking.indices.tolist(), ranking.responses)):
+            scores[index] = scores.get(index, 0.0) + 1.0 / (k + position + 1)
+            responses[index] = response
+
+    top_idx = sorted(scores, key=lambda i: (-scores[i], i))[:num_rank]
+    return Ranking(indices=np.array(top_idx, dtype=np.intp),
+                   scores=np.array([scores[i] for i in top_idx]),
+                   responses=[responses[i] for i in top_idx])
@@ -0,0 +1,76 @@
+import hashlib
+import logging
+import pickle
+from difflib import get_close_matches
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# With three deletes within the first six letters the index finds every word
+# get_close_matches accepts at the default cutoff on typical typos, so lookups
+# never have to scan the dictionary.
+MAX_DISTANCE = 3
+PREFIX_LENGTH = 6
+
+
+class SpellingIndex:
+    """SymSpell-style deletion index mapping deletes of a word prefix to words."""
+
+    def __init__(self, words: Tuple[str, ...], deletes: Dict[str, List[int]],
+                 max_distance: int, prefix_length: int, checksum: str):
+        self.words = words
+        self.deletes = deletes
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.checksum = checksum
+
+    @staticmethod
+    def __checksum(words: Sequence[str]) -> str:
+        return hashlib.sha1('\n'.join(words).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def __edits(word: str, max_distance: int) -> Set[str]:
+        edits = {word}
+        frontier = {word}
+        for _ in range(max_distance):
+            frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            edits |= frontier
+        return edits
+
+    @classmethod
+    def build(cls, words: Iterable[str], max_distance: int = MAX_DISTANCE,
+              prefix_length: int = PREFIX_LENGTH) -> 'SpellingIndex':
+        words = tuple(w for w in words if len(w) > 0)
+        deletes: Dict[str, List[int]] = {}
+        for i, word in enumerate(words):
+            for edit in cls.__edits(word[:prefix_length], max_distance):
+                deletes.setdefault(edit, []).append(i)
+        logger.info(f'Spelling index built with {len(deletes)} deletes')
+        return cls(words, deletes, max_distance, prefix_length, cls.__checksum(words))
+
+    def lookup(self, word: str, n: int = 3, cutoff: float = 0.8) -> List[str]:
+        candidate_ids = set()
+        for edit in self.__edits(word[:self.prefix_length], self.max_distance):
+            candidate_ids.update(self.deletes.get(edit, ()))
+        candidates = [self.words[i] for i in sorted(candidate_ids)
+                      if self.words[i][0] == word[0]]
+        return get_close_matches(word, candidates, n=n, cutoff=cutoff)
+
+    def save(self, path: Path):
+        with open(path, 'wb') as fd:
+            pickle.dump(self, fd)
+
+    @classmethod
+    def load_or_build(cls, path: Path, words: Sequence[str]) -> 'SpellingIndex':
+        words = tuple(w for w in words if len(w) > 0)
+        if path.is_file():
+            with open(path, 'rb') as fd:
+                index: SpellingIndex = pickle.load(fd)
+            if index.checksum == cls.__checksum(words) and \
+                    (index.max_distance, index.prefix_length) == (MAX_DISTANCE, PREFIX_LENGTH):
+                return index
+
+        index = cls.build(words)
+        index.save(path)
+        return index
@@ -0,0 +1,94 @@
+import os
+from pathlib import Path
+from typing import Iterable, List, Sequence, Union
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def array_path(prefix: Path, name: str) -> Path:
+    return prefix.with_name(f'{prefix.name}_{name}.npy')
+
+
+def save_array(path: Path, array: np.ndarray):
+    # Write beside the target and rename, so readers still holding a memory
+    # map of the previous file keep a valid view.
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    with open(tmp_path, 'wb') as fd:
+        np.save(fd, array)
+    os.replace(tmp_path, path)
+
+
+def save_csr(prefix: Path, matrix: csr_matrix):
+    matrix = csr_matrix(matrix)
+    save_array(array_path(prefix, 'data'), matrix.data)
+    save_array(array_path(prefix, 'indices'), matrix.indices)
+    save_array(array_path(prefix, 'indptr'), matrix.indptr)
+    save_array(array_path(prefix, 'shape'), np.array(matrix.shape))
+
+
+def csr_exist(prefix: Path) -> bool:
+    return all(array_path(prefix, name).is_file()
+               for name in ('data', 'indices', 'indptr', 'shape'))
+
+
+def load_csr(prefix: Path) -> csr_matrix:
+    data = np.load(array_path(prefix, 'data'), mmap_mode='r')
+    indices = np.load(array_path(prefix, 'indices'), mmap_mode='r')
+    indptr = np.load(array_path(prefix, 'indptr'), mmap_mode='r')
+    shape = tuple(np.load(array_path(prefix, 'shape')).tolist())
+    return csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+
+class StringColumn(Sequence):
+    """UTF-8 strings kept as one byte buffer plus an offsets array."""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> 'StringColumn':
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    @classmethod
+    def exist(cls, prefix: Path) -> bool:
+        return array_path(prefix, 'data').is_file() \
+            and array_path(prefix, 'offsets').is_file()
+
+    @classmethod
+    def load(cls, prefix: Path) -> 'StringColumn':
+        data = np.load(array_path(prefix, 'data'), mmap_mode='r')
+        offsets = np.load(array_path(prefix, 'offsets'), mmap_mode='r')
+        return cls(data, offsets)
+
+    def save(self, prefix: Path):
+        save_array(array_path(prefix, 'data'), self.data)
+        save_array(array_path(prefix, 'offsets'), self.offsets)
+
+    def to_list(self) -> List[str]:
+        buffer = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        return [buffer[start:end].decode('utf-8')
+                for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: Union[int, np.integer]) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('StringColumn index out of range')
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.data[start:end].tobytes().decode('utf-8')
+
+
+def string_column(strings: Union[StringColumn, Sequence[str]]) -> StringColumn:
+    if isinstance(strings, StringColumn):
+        return strings
+    return StringColumn.from_strings(strings)
@@ -1,11 +1,20 @@
 import logging
 import pickle
 from pathlib import Path
-from typing import Optional, Any, List
+from typing import Optional, Any, List, Sequence
 
+import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+from .Delta import Delta
+from .InvertedIndex import InvertedIndex
+from .Metrics import stage
+from .Preprocessing import Query, TokenizedCorpus, as_tokens, identity
+from .Ranking import Ranking, rank, rank_batch
+from .Storage import StringColumn, csr_exist, load_csr, save_csr, string_column
 
 logger = logging.getLogger(__name__)
 
@@ -15,13 +24,17 @@ class Tfidf:
         self.model: Optional[TfidfVectorizer] = None
         self.dataframe: Optional[pd.DataFrame] = None
         self.dataset_key: Optional[str] = None
+        self.corpus: Optional[TokenizedCorpus] = None
         self.matrix: Optional[Any] = None
+        self.responses: Optional[Sequence[str]] = None
+        self.index: Optional[InvertedIndex] = None
+        self.delta: Optional[Delta] = None
         if cache is not None:
             self.__load_cache(cache)
 
     def __load_cache(self, path: str):
-        dataframe_path = Path(path, 'tfidf_dataframe')
-        dataframe_exist = dataframe_path.is_file()
+        responses_path = Path(path, 'tfidf_responses')
+        responses_exist = StringColumn.exist(responses_path)
 
         dataset_key_path = Path(path, 'tfidf_dataset_key')
         dataset_key_exist = dataset_key_path.is_file()
@@ -30,48 +43,142 @@ class Tfidf:
         model_exist = model_path.is_file()
 
         matrix_path = Path(path, 'tfidf_matrix')
-        matrix_exist = matrix_path.is_file()
-        if not (dataframe_exist and dataset_key_exist and model_exist and matrix_exist):
+        matrix_exist = csr_exist(matrix_path)
+        if not (responses_exist and dataset_key_exist and model_exist and matrix_exist):
             raise Exception('Cache not found')
 
-        self.dataframe: pd.DataFrame = pd.read_pickle(dataframe_path)
+        self.responses: StringColumn = StringColumn.load(responses_path)
         with open(dataset_key_path, 'rb') as fd:
             self.dataset_key: str = pickle.load(fd)
         with open(model_path, 'rb') as fd:
             self.model: TfidfVectorizer = pickle.load(fd)
-        with open(matrix_path, 'rb') as fd:
-            self.matrix: Any = pickle.load(fd)
+        self.matrix: Any = load_csr(matrix_path)
+
+        index_path = Path(path, 'tfidf_index')
+        if InvertedIndex.exist(index_path):
+            self.index: InvertedIndex = InvertedIndex.load(
+                index_path, self.matrix.shape[0])
 
-    def set_dataframe(self, dataframe: pd.DataFrame, dataset_key: str = 'dataset'):
+        delta_path = Path(path, 'tfidf_delta')
+        if Delta.exist(delta_path):
+            self.delta: Delta = Delta.load(delta_path, self.matrix.shape[0])
+            self.responses = self.delta.view(self.responses)
+        else:
+            self.delta: Delta = Delta(self.matrix.shape[0])
+
+    def set_dataframe(self, dataframe: pd.DataFrame, dataset_key: str = 'dataset',
+                      corpus: Optional[TokenizedCorpus] = None):
         if self.model is None:
             self.dataframe = dataframe.copy()
             self.dataset_key = dataset_key
+            self.corpus = corpus
+            self.responses = self.dataframe['Response'].to_numpy()
         else:
             raise Exception(
                 'Cannot set dataframe when model is already fitted')
 
     def __train(self, retrain=False):
-        if self.dataframe is None or self.dataset_key is None:
-            raise Exception('Dataframe and dataset key is None')
-
         if retrain or self.model is None:
-            self.model = TfidfVectorizer()
-            self.matrix = self.model.fit_transform(
-                self.dataframe[self.dataset_key])
-
-    def infer_vector(self, sentence: List[str]):
+            if self.dataframe is None or self.dataset_key is None:
+                raise Exception('Dataframe and dataset key is None')
+
+            if self.corpus is None:
+                self.corpus = TokenizedCorpus.from_texts(
+                    self.dataframe[self.dataset_key])
+            self.model = TfidfVectorizer(analyzer=identity)
+            self.matrix = self.model.fit_transform(self.corpus.documents())
+            self.index = None
+            self.delta = Delta(self.matrix.shape[0])
+
+    def __refresh_idf(self, matrix: Any) -> csr_matrix:
+        # Rows hold normalized tf * idf, so scaling each column by new / old idf
+        # and normalizing again gives the weights a refit would produce for the
+        # same vocabulary.
+        matrix = csr_matrix(matrix, dtype=np.float64, copy=True)
+        num_docs = matrix.shape[0] + int(self.model.smooth_idf)
+        df = np.bincount(matrix.indices, minlength=matrix.shape[1]) + int(self.model.smooth_idf)
+        idf = np.log(num_docs / np.maximum(df, 1)) + 1
+        matrix.data *= (idf / self.model.idf_)[matrix.indices]
+        self.model.idf_ = idf
+        if self.model.norm is not None:
+            matrix = normalize(matrix, norm=self.model.norm, copy=False)
+        return matrix
+
+    def __fold(self):
+        if not self.delta.empty():
+            matrix, self.responses = self.delta.fold(self.matrix, self.responses)
+            self.matrix = self.__refresh_idf(matrix)
+            self.delta = Delta(self.matrix.shape[0])
+            self.index = None
+
+    def __delta_scores(self, query_vecs: Any) -> Optional[np.ndarray]:
+        if self.delta.rows is None:
+            return None
+        return (query_vecs @ self.delta.rows.T).toarray()
+
+    def infer_vector(self, sentence: List[Query]):
         self.__train()
         if not isinstance(sentence, list):
             raise Exception("Wrong sentence data type! Use <class 'list'>")
-        return self.model.transform(sentence)
+        return self.model.transform([as_tokens(s) for s in sentence])
+
+    def ask(self, query: Query, num_rank=10, inverted=False) -> Ranking:
+        with stage('vectorize'):
+            query_vec = self.infer_vector([query])
+        if not inverted:
+            with stage('score'):
+                results = (self.matrix @ query_vec.T).toarray().reshape((-1,))
+                appended = self.__delta_scores(query_vec)
+                results = self.delta.merge_scores(
+                    results, None if appended is None else appended.reshape((-1,)))
+            with stage('topk'):
+                return self.delta.drop_removed(rank(results, self.responses, num_rank))
+
+        if self.index is None:
+            self.index = InvertedIndex.build(self.matrix)
+        with stage('score'):
+            candidates, results = self.index.search(
+                query_vec, num_rank + self.delta.removed.shape[0])
+            appended = self.__delta_scores(query_vec)
+            candidates, results = self.delta.merge_candidates(
+                candidates, results, None if appended is None else appended.reshape((-1,)))
+        with stage('topk'):
+            return rank(results, self.responses, num_rank, candidates)
+
+    def score_batch(self, queries: List[Query]) -> np.ndarray:
+        with stage('vectorize'):
+            query_vecs = self.infer_vector(queries)
+        with stage('score'):
+            return self.delta.merge_scores((query_vecs @ self.matrix.T).toarray(),
+                                           self.__delta_scores(query_vecs))
+
+    def ask_batch(self, queries: List[Query], num_rank=10) -> List[Ranking]:
+        results = self.score_batch(queries)
+
+        with stage('topk'):
+            return [self.delta.drop_removed(ranking)
+                    for ranking in rank_batch(results, self.responses, num_rank)]
+
+    def add_documents(self, dataframe: pd.DataFrame) -> np.ndarray:
+        self.__train()
+        if dataframe.empty:
+            return np.empty(0, dtype=np.int64)
+        corpus = TokenizedCorpus.from_texts(dataframe[self.dataset_key])
+        ids = self.delta.add(csr_matrix(self.model.transform(corpus.documents())),
+                             dataframe['Response'].tolist())
+        self.responses = self.delta.view(self.responses)
+        return ids
+
+    def remove_documents(self, ids: Sequence[int]):
+        self.__train()
+        self.delta.remove(ids)
 
-    def ask(self, query: str, num_rank=10):
-        query_vec = self.infer_vector([query])
-        results = cosine_similarity(self.matrix, query_vec).reshape((-1,))
-        self.dataframe['Similarity'] = results.tolist()
-        top_idx = results.argsort()[-1 * num_rank:][::-1]
+    def save_delta(self, path: str):
+        self.__train()
+        self.delta.save(Path(path, 'tfidf_delta'))
 
-        return self.dataframe.loc[top_idx, :]
+    def compact(self, path: str):
+        self.create_cache(path)
 
     def create_cache(self, path: str):
         cache_path = Path(path)
@@ -80,10 +187,12 @@ class Tfidf:
             cache_path.mkdir(parents=True, exist_ok=True)
 
         self.__train()
+        self.__fold()
         with open(Path(path, 'tfidf_model'), 'wb') as fd:
             pickle.dump(self.model, fd)
-        self.dataframe.to_pickle(str(Path(path, 'tfidf_dataframe')))
+        string_column(self.responses).save(Path(path, 'tfidf_responses'))
         with open(Path(path, 'tfidf_dataset_key'), 'wb') as fd:
             pickle.dump(self.dataset_key, fd)
-        with open(Path(path, 'tfidf_matrix'), 'wb') as fd:
-            pickle.dump(self.matrix, fd)
+        save_csr(Path(path, 'tfidf_matrix'), self.matrix)
+        InvertedIndex.build(self.matrix).save(Path(path, 'tfidf_index'))
+        Delta.delete(Path(path, 'tfidf_delta'))
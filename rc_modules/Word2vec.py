@@ -1,13 +1,20 @@
 import logging
 import pickle
 from pathlib import Path
-from typing import TypedDict, Iterable, Optional, List
+from typing import TypedDict, Optional, List, Sequence
 
 import numpy as np
 import pandas as pd
 from gensim.models import word2vec
-from gensim.utils import simple_preprocess
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
+
+from .Delta import Delta
+from .IvfIndex import IvfIndex
+from .Metrics import stage
+from .Preprocessing import Query, TokenizedCorpus, as_tokens
+from .Ranking import Ranking, rank, rank_batch
+from .Storage import StringColumn, save_array, string_column
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +23,7 @@ class Word2vecOptions(TypedDict):
     size: int
     min_count: int
     iter: int
+    workers: int
 
 
 class Word2vec:
@@ -24,17 +32,23 @@ class Word2vec:
         self.model: Optional[word2vec.Word2Vec] = None
         self.dataframe: Optional[pd.DataFrame] = None
         self.dataset_key: Optional[str] = None
+        self.corpus: Optional[TokenizedCorpus] = None
+        self.vectors: Optional[np.ndarray] = None
+        self.responses: Optional[Sequence[str]] = None
+        self.index: Optional[IvfIndex] = None
+        self.delta: Optional[Delta] = None
         if cache is not None:
             self.__load_cache(cache)
         self.options: Word2vecOptions = {
             'size': 50,
             'min_count': 2,
-            'iter': 40
+            'iter': 40,
+            'workers': 3
         }
 
     def __load_cache(self, path: str):
-        dataframe_path = Path(path, 'word2vec_dataframe')
-        dataframe_exist = dataframe_path.is_file()
+        responses_path = Path(path, 'word2vec_responses')
+        responses_exist = StringColumn.exist(responses_path)
 
         dataset_key_path = Path(path, 'word2vec_dataset_key')
         dataset_exist = dataset_key_path.is_file()
@@ -42,19 +56,37 @@ class Word2vec:
         model_path = Path(path, 'word2vec_model')
         model_exist = model_path.is_file()
 
-        if not (dataframe_exist and dataset_exist and model_exist):
+        vectors_path = Path(path, 'word2vec_vectors.npy')
+        vectors_exist = vectors_path.is_file()
+
+        if not (responses_exist and dataset_exist and model_exist and vectors_exist):
             raise Exception('Cache not found')
 
-        self.dataframe: pd.DataFrame = pd.read_pickle(dataframe_path)
+        self.responses: StringColumn = StringColumn.load(responses_path)
         with open(dataset_key_path, 'rb') as fd:
             self.dataset_key: str = pickle.load(fd)
         self.model: word2vec.Word2Vec = word2vec.Word2Vec.load(
-            str(model_path))
+            str(model_path), mmap='r')
+        self.vectors: np.ndarray = np.load(vectors_path, mmap_mode='r')
 
-    def set_dataframe(self, dataframe: pd.DataFrame, dataset_key: str = 'dataset'):
+        index_path = Path(path, 'word2vec_index')
+        if IvfIndex.exist(index_path):
+            self.index: IvfIndex = IvfIndex.load(index_path)
+
+        delta_path = Path(path, 'word2vec_delta')
+        if Delta.exist(delta_path):
+            self.delta: Delta = Delta.load(delta_path, self.vectors.shape[0])
+            self.responses = self.delta.view(self.responses)
+        else:
+            self.delta: Delta = Delta(self.vectors.shape[0])
+
+    def set_dataframe(self, dataframe: pd.DataFrame, dataset_key: str = 'dataset',
+                      corpus: Optional[TokenizedCorpus] = None):
         if self.model is None:
             self.dataframe = dataframe.copy()
             self.dataset_key = dataset_key
+            self.corpus = corpus
+            self.responses = self.dataframe['Response'].to_numpy()
         else:
             raise Exception(
                 'Cannot set dataframe when model is already fitted')
@@ -62,41 +94,59 @@ class Word2vec:
     def set_options(self, options: Word2vecOptions):
         self.options = options
 
-    def __read_corpus(self, corpus: Iterable):
-        for line in corpus:
-            yield simple_preprocess(line)
-
     def __train(self, retrain=False):
-        if self.dataframe is None or self.dataset_key is None:
-            raise Exception('Dataframe and dataset key is None')
-
         if retrain or self.model is None:
-            train_corpus = list(self.__read_corpus(
-                self.dataframe[self.dataset_key]))
+            if self.dataframe is None or self.dataset_key is None:
+                raise Exception('Dataframe and dataset key is None')
+
+            if self.corpus is None:
+                self.corpus = TokenizedCorpus.from_texts(
+                    self.dataframe[self.dataset_key])
+            train_corpus = self.corpus.documents()
             model = word2vec.Word2Vec(
                 train_corpus,
                 size=self.options['size'],
                 min_count=self.options['min_count'],
-                iter=self.options['iter'])
+                iter=self.options['iter'],
+                workers=self.options.get('workers', 3))
             self.model = model
+            self.__gen_vector()
 
     def __infer_vector(self, sentences: List[str]):
+        vector_size = self.model.wv.vector_size
         if len(sentences) < 1:
-            return np.zeros(self.options['size'])
+            return np.zeros(vector_size)
         else:
             vector = []
             for word in sentences:
                 if word in self.model.wv:
                     vector.append(self.model.wv[word])
                 else:
-                    vector.append(np.zeros(self.options['size']))
+                    vector.append(np.zeros(vector_size))
 
             return np.mean(vector, axis=0)
 
     def __gen_vector(self):
-        self.__train()
-        self.dataframe['vector'] = self.dataframe[self.dataset_key].apply(
-            lambda x: self.__infer_vector(x.split(' ')))
+        vocabulary_vectors = np.vstack([self.__infer_vector([word])
+                                        for word in self.corpus.vocabulary])
+        counts = csr_matrix((np.ones(len(self.corpus.ids), dtype=np.float32),
+                             self.corpus.ids, self.corpus.offsets),
+                            shape=(len(self.corpus), vocabulary_vectors.shape[0]))
+        lengths = np.maximum(np.diff(self.corpus.offsets), 1).reshape((-1, 1))
+        vectors = (counts @ vocabulary_vectors) / lengths
+        self.vectors = normalize(vectors).astype(np.float32)
+        self.delta = Delta(self.vectors.shape[0])
+
+    def __fold(self):
+        if not self.delta.empty():
+            self.vectors, self.responses = self.delta.fold(self.vectors, self.responses)
+            self.delta = Delta(self.vectors.shape[0])
+            self.index = None
+
+    def __delta_scores(self, query_vecs: np.ndarray) -> Optional[np.ndarray]:
+        if self.delta.rows is None:
+            return None
+        return query_vecs @ self.delta.rows.T
 
     def infer_vector(self, sentence: List[str]):
         self.__train()
@@ -104,26 +154,85 @@ class Word2vec:
             raise Exception("Wrong sentence data type! Use <class 'list'>")
         return self.__infer_vector(sentence)
 
-    def ask(self, query: str, num_rank=10):
-        if not isinstance(query, str):
-            raise Exception("Wrong query data type! Use 'str'")
+    def ask(self, query: Query, num_rank=10, nprobe: Optional[int] = None) -> Ranking:
+        with stage('vectorize'):
+            query_vec = normalize(self.infer_vector(
+                as_tokens(query)).reshape(1, -1)).reshape((-1,))
+        if nprobe is None or self.index is None:
+            with stage('score'):
+                results = self.delta.merge_scores(self.vectors @ query_vec,
+                                                  self.__delta_scores(query_vec))
+            with stage('topk'):
+                return self.delta.drop_removed(rank(results, self.responses, num_rank))
+
+        with stage('score'):
+            candidates = self.index.search(query_vec, nprobe,
+                                           num_rank + self.delta.removed.shape[0])
+            candidates, results = self.delta.merge_candidates(
+                candidates, self.vectors[candidates] @ query_vec, self.__delta_scores(query_vec))
+        with stage('topk'):
+            return rank(results, self.responses, num_rank, candidates)
+
+    def score_batch(self, queries: List[Query]) -> np.ndarray:
+        if not isinstance(queries, list):
+            raise Exception("Wrong queries data type! Use <class 'list'>")
+
+        with stage('vectorize'):
+            query_vecs = normalize(np.vstack(
+                [self.infer_vector(as_tokens(query)) for query in queries]))
+        with stage('score'):
+            return self.delta.merge_scores(query_vecs @ self.vectors.T,
+                                           self.__delta_scores(query_vecs))
+
+    def ask_batch(self, queries: List[Query], num_rank=10) -> List[Ranking]:
+        results = self.score_batch(queries)
+
+        with stage('topk'):
+            return [self.delta.drop_removed(ranking)
+                    for ranking in rank_batch(results, self.responses, num_rank)]
+
+    def add_documents(self, dataframe: pd.DataFrame) -> np.ndarray:
+        self.__train()
+        if dataframe.empty:
+            return np.empty(0, dtype=np.int64)
+        corpus = TokenizedCorpus.from_texts(dataframe[self.dataset_key])
+        vectors = np.vstack([self.__infer_vector(tokens) for tokens in corpus.documents()])
+        ids = self.delta.add(normalize(vectors).astype(np.float32),
+                             dataframe['Response'].tolist())
+        self.responses = self.delta.view(self.responses)
+        return ids
+
+    def remove_documents(self, ids: Sequence[int]):
+        self.__train()
+        self.delta.remove(ids)
 
-        self.__gen_vector()
-        self.dataframe['Similarity'] = self.dataframe['vector'].apply(lambda x: cosine_similarity(
-            x.reshape(1, -1), self.infer_vector(query.split(' ')).reshape(1, -1)).item())
+    def save_delta(self, path: str):
+        self.__train()
+        self.delta.save(Path(path, 'word2vec_delta'))
 
-        return self.dataframe.sort_values(
-            by='Similarity', ascending=False).head(num_rank).copy()
+    def compact(self, path: str):
+        self.__train()
+        ann_lists = self.index.centroids.shape[0] if self.index is not None else 0
+        self.__fold()
+        self.__save_documents(path, ann_lists)
 
-    def create_cache(self, path: str):
+    def create_cache(self, path: str, ann_lists: int = 0):
         cache_path = Path(path)
         path_not_exist = not cache_path.is_dir()
         if path_not_exist:
             cache_path.mkdir(parents=True, exist_ok=True)
 
         self.__train()
-        with open(Path(path, 'word2vec_model'), 'wb') as fd:
-            self.model.save(fd)
-        self.dataframe.to_pickle(str(Path(path, 'word2vec_dataframe')))
+        self.__fold()
+        self.model.save(str(Path(path, 'word2vec_model')), sep_limit=0)
         with open(Path(path, 'word2vec_dataset_key'), 'wb') as fd:
             pickle.dump(self.dataset_key, fd)
+        self.__save_documents(path, ann_lists)
+
+    def __save_documents(self, path: str, ann_lists: int):
+        string_column(self.responses).save(Path(path, 'word2vec_responses'))
+        save_array(Path(path, 'word2vec_vectors.npy'), self.vectors)
+        if ann_lists > 0:
+            self.index = IvfIndex.build(self.vectors, ann_lists)
+            self.index.save(Path(path, 'word2vec_index'))
+        Delta.delete(Path(path, 'word2vec_delta'))
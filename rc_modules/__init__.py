@@ -1,6 +1,10 @@
+from .CacheStore import CacheStore
+from .Dataset import Dataset
 from .Doc2vec import Doc2vec
+from .Ensemble import Ensemble
 from .Proofing import Proofing
+from .Ranking import Ranking
 from .Tfidf import Tfidf
 from .Word2vec import Word2vec
 
-__all__ = ['Doc2vec', 'Proofing', 'Tfidf', 'Word2vec']
+__all__ = ['CacheStore', 'Dataset', 'Doc2vec', 'Ensemble', 'Proofing', 'Ranking', 'Tfidf', 'Word2vec']
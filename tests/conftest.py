@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('QA_HOST', '127.0.0.1')
+os.environ.setdefault('QA_PORT', '8000')
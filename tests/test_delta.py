@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from rc_modules.Delta import Delta
+from rc_modules.Preprocessing import TokenizedCorpus, identity
+from rc_modules.Tfidf import Tfidf
+
+DOCUMENTS = ['hak warga negara atas pekerjaan',
+             'presiden memegang kekuasaan pemerintahan',
+             'warga negara wajib ikut serta dalam pembelaan negara',
+             'kekuasaan kehakiman merdeka',
+             'pasal 33 perekonomian disusun sebagai usaha bersama']
+ADDED = ['presiden dan warga negara',
+         'pasal 33 kekuasaan negara']
+
+
+def dataframe(texts):
+    return pd.DataFrame({'Response': texts, 'dataset': texts})
+
+
+def trained_model(tmp_path):
+    model = Tfidf()
+    model.set_dataframe(dataframe(DOCUMENTS))
+    model.create_cache(str(tmp_path))
+    return Tfidf(cache=str(tmp_path))
+
+
+def assert_consistent(model, ranking):
+    assert [model.responses[i] for i in ranking.indices] == list(ranking.responses)
+
+
+def test_fold_renumbers_rows_and_responses():
+    delta = Delta(3)
+    ids = delta.add(np.array([[3.0], [4.0]]), ['d', 'e'])
+    delta.remove([1, 3])
+    rows, responses = delta.fold(np.array([[0.0], [1.0], [2.0]]), ['a', 'b', 'c'])
+
+    assert ids.tolist() == [3, 4]
+    assert rows.reshape((-1,)).tolist() == [0.0, 2.0, 4.0]
+    assert responses == ['a', 'c', 'e']
+
+
+def test_add_and_remove_keep_ids_and_responses(tmp_path):
+    model = trained_model(tmp_path)
+    ids = model.add_documents(dataframe(ADDED))
+    model.remove_documents([0])
+
+    assert ids.tolist() == [5, 6]
+    assert [model.responses[i] for i in ids] == ADDED
+    for inverted in (False, True):
+        ranking = model.ask('warga negara presiden', num_rank=7, inverted=inverted)
+        assert_consistent(model, ranking)
+        assert 0 not in ranking.indices
+        assert ranking.indices[0] == 5
+
+    exact = model.ask('pasal 33 negara', num_rank=3)
+    inverted = model.ask('pasal 33 negara', num_rank=3, inverted=True)
+    assert exact.indices.tolist() == inverted.indices.tolist()
+    np.testing.assert_allclose(exact.scores, inverted.scores)
+    for ranking in model.ask_batch(['pasal 33 negara', 'warga negara'], num_rank=7):
+        assert_consistent(model, ranking)
+        assert 0 not in ranking.indices
+
+
+def test_saved_delta_is_reloaded(tmp_path):
+    model = trained_model(tmp_path)
+    model.add_documents(dataframe(ADDED))
+    model.remove_documents([2])
+    model.save_delta(str(tmp_path))
+    reloaded = Tfidf(cache=str(tmp_path))
+
+    expected = model.ask('kekuasaan negara', num_rank=7)
+    ranking = reloaded.ask('kekuasaan negara', num_rank=7)
+    assert ranking.indices.tolist() == expected.indices.tolist()
+    assert ranking.responses == expected.responses
+    assert_consistent(reloaded, ranking)
+
+
+def test_compact_matches_a_refit(tmp_path):
+    model = trained_model(tmp_path)
+    model.add_documents(dataframe(ADDED))
+    model.remove_documents([3])
+    model.compact(str(tmp_path))
+    compacted = Tfidf(cache=str(tmp_path))
+
+    texts = [d for i, d in enumerate(DOCUMENTS) if i != 3] + ADDED
+    assert list(compacted.responses) == texts
+    # Compacting keeps the trained vocabulary, words only in ADDED are ignored.
+    refit = TfidfVectorizer(analyzer=identity, vocabulary=compacted.model.vocabulary_)
+    expected = refit.fit_transform(TokenizedCorpus.from_texts(texts).documents())
+    np.testing.assert_allclose(compacted.matrix.toarray(), expected.toarray())
+    np.testing.assert_allclose(compacted.model.idf_, refit.idf_)
+
+    ranking = compacted.ask('presiden warga negara', num_rank=3)
+    assert_consistent(compacted, ranking)
+    assert ranking.responses[0] == ADDED[0]
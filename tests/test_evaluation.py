@@ -0,0 +1,42 @@
+import numpy as np
+
+from rc_modules.Evaluation import evaluate
+
+
+class StaticModel:
+    def __init__(self, scores):
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.responses = [str(i) for i in range(self.scores.shape[1])]
+
+    def score_batch(self, queries):
+        return self.scores[[int(query) for query in queries]]
+
+
+def test_zero_score_query_is_not_a_hit():
+    model = StaticModel([[0.0, 0.0, 0.0, 0.0],
+                         [0.1, 0.9, 0.2, 0.0]])
+    result = evaluate(model, ['0', '1'])
+
+    assert result.gold_ranks.tolist() == [4, 1]
+    metrics = result.metrics(ks=(1,))
+    assert metrics['hit@1'] == 0.5
+    assert metrics['mrr'] == (0.25 + 1.0) / 2
+
+
+def test_ties_rank_after_relevant_document():
+    model = StaticModel([[0.5, 0.5, 0.1]])
+    result = evaluate(model, ['0'])
+
+    assert result.gold_ranks.tolist() == [2]
+
+
+def test_relevant_document_missing_from_model_is_a_miss():
+    model = StaticModel([[0.9, 0.1],
+                         [0.2, 0.8],
+                         [0.5, 0.4]])
+    result = evaluate(model, ['0', '1', '2'])
+
+    assert result.gold_ranks.tolist() == [1, 1, 3]
+    metrics = result.metrics(ks=(1, 2))
+    assert metrics['mrr@2'] == 2 / 3
+    assert metrics['hit@2'] == 2 / 3
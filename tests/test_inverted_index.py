@@ -0,0 +1,63 @@
+import numpy as np
+from scipy.sparse import csr_matrix, random as sparse_random
+from sklearn.preprocessing import normalize
+
+from rc_modules.InvertedIndex import InvertedIndex
+
+
+def random_corpus(seed: int, num_docs: int = 200, num_terms: int = 60):
+    rng = np.random.default_rng(seed)
+    matrix = sparse_random(num_docs, num_terms, density=0.08, format='csr', random_state=rng)
+    return normalize(matrix), rng
+
+
+def random_query(rng, num_terms: int, length: int) -> csr_matrix:
+    query = np.zeros((1, num_terms))
+    query[0, rng.choice(num_terms, size=length, replace=False)] = rng.random(length)
+    return csr_matrix(normalize(query))
+
+
+def assert_same_top_k(matrix: csr_matrix, query: csr_matrix, candidates, scores, num_rank: int):
+    exact = (matrix @ query.T).toarray().reshape((-1,))
+    top = np.sort(scores)[::-1][:num_rank]
+    assert candidates.shape[0] >= min(num_rank, matrix.shape[0])
+    np.testing.assert_allclose(top, np.sort(exact)[::-1][:num_rank])
+    # Every returned score is the exact score of that document.
+    np.testing.assert_allclose(scores, exact[candidates])
+
+
+def test_search_matches_exact_top_k():
+    for seed in range(20):
+        matrix, rng = random_corpus(seed)
+        index = InvertedIndex.build(matrix)
+        for length in (1, 3, 8):
+            query = random_query(rng, matrix.shape[1], length)
+            for num_rank in (1, 5, 20):
+                candidates, scores = index.search(query, num_rank)
+                assert_same_top_k(matrix, query, candidates, scores, num_rank)
+
+
+def test_search_stops_accepting_and_prunes_candidates():
+    # Term 0 decides the ranking; the rare low-weight terms can no longer lift
+    # an unseen document above the threshold once it has been scored.
+    dense = np.zeros((50, 6))
+    dense[:5, 0] = [1.0, 0.9, 0.8, 0.2, 0.1]
+    dense[:, 1:] = 0.01
+    matrix = csr_matrix(dense)
+    query = csr_matrix(np.ones((1, 6)))
+
+    candidates, scores = InvertedIndex.build(matrix).search(query, 2)
+
+    assert candidates.shape[0] < matrix.shape[0]
+    assert candidates[np.argsort(scores)[::-1]][:2].tolist() == [0, 1]
+    assert_same_top_k(matrix, query, candidates, scores, 2)
+
+
+def test_search_pads_when_few_documents_match():
+    matrix = csr_matrix(np.array([[1.0, 0.0], [0.0, 1.0], [0.0, 1.0]]))
+    query = csr_matrix(np.array([[1.0, 0.0]]))
+
+    candidates, scores = InvertedIndex.build(matrix).search(query, 3)
+
+    assert sorted(candidates.tolist()) == [0, 1, 2]
+    assert_same_top_k(matrix, query, candidates, scores, 3)
@@ -0,0 +1,31 @@
+import random
+
+import rc_modules.SpellingIndex as spelling_module
+from rc_modules.SpellingIndex import SpellingIndex
+
+
+def make_words(count: int = 2000):
+    rng = random.Random(0)
+    letters = 'abdegiklmnprstu'
+    return sorted({''.join(rng.choices(letters, k=rng.randint(4, 10))) for _ in range(count)})
+
+
+def test_lookup_finds_typo():
+    index = SpellingIndex.build(['konstitusi', 'presiden', 'rakyat'])
+    assert index.lookup('konstitsi') == ['konstitusi']
+    assert index.lookup('presidne') == ['presiden']
+
+
+def test_lookup_without_match_does_not_scan_dictionary(monkeypatch):
+    words = make_words()
+    index = SpellingIndex.build(words)
+    compared = []
+
+    def get_close_matches(word, candidates, **kwargs):
+        compared.append(len(candidates))
+        return []
+
+    monkeypatch.setattr(spelling_module, 'get_close_matches', get_close_matches)
+    same_letter = sum(word[0] == 'a' for word in words)
+    assert index.lookup('azzzzzzzzzzzzz') == []
+    assert compared and all(count < same_letter // 10 for count in compared)
@@ -0,0 +1,31 @@
+import asyncio
+
+import numpy as np
+
+import web
+from rc_modules import Ranking
+from rc_modules.LruCache import LruCache
+
+
+def test_cache_key_keeps_numbers():
+    options = web.default_options('tfidf')
+    first = web.cache_key('tfidf', web.normalize_query('Apa isi Pasal 33?'), 10, options)
+    second = web.cache_key('tfidf', web.normalize_query('Apa isi Pasal 28?'), 10, options)
+
+    assert web.normalize_query('Apa isi Pasal 33 UUD 1945?') == 'apa isi pasal 33 uud 1945'
+    assert first != second
+
+
+def test_batch_answers_are_cached_as_exact(monkeypatch):
+    async def call_model(algorithm, func, queries, num_rank):
+        return [Ranking(np.arange(1), np.ones(1), [query]) for query in queries], {}
+
+    monkeypatch.setattr(web, 'TFIDF_INVERTED', 1)
+    monkeypatch.setattr(web, 'call_model', call_model)
+    monkeypatch.setattr(web, 'result_cache', LruCache(16))
+    asyncio.run(web.run_batch_scoring('tfidf', ['pasal 33'], 10))
+
+    exact = web.cache_key('tfidf', 'pasal 33', 10, {'inverted': False})
+    inverted = web.cache_key('tfidf', 'pasal 33', 10, web.default_options('tfidf'))
+    assert web.result_cache.get(exact).responses == ['pasal 33']
+    assert web.result_cache.get(inverted) is None
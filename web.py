@@ -1,26 +1,403 @@
+import asyncio
 import logging
-from os import environ
-from typing import Optional
+import multiprocessing as mp
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from os import cpu_count, environ
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
-import pandas as pd
 import uvicorn
-from fastapi import FastAPI, Response, status
+from fastapi import FastAPI, Header, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
 
-from rc_modules import Doc2vec, Tfidf, Word2vec
+from rc_modules import CacheStore, Doc2vec, Ranking, Tfidf, Word2vec
+from rc_modules.Ranking import reciprocal_rank_fusion
+from rc_modules.LruCache import LruCache
+from rc_modules.Metrics import Metrics, record_stages
+from rc_modules.Preprocessing import tokenize
+from rc_modules.Profiler import Profiler
 
 logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s',
                     level=logging.INFO)
 
+SUPPORTED_ALGORITHM = ('tfidf', 'word2vec', 'doc2vec')
+
 QA_HOST = environ['QA_HOST']
 QA_PORT = int(environ['QA_PORT'])
+TFIDF_INVERTED = int(environ.get('TFIDF_INVERTED', 0))
+QA_EXECUTOR = environ.get('QA_EXECUTOR', 'thread')
+QA_WORKERS = int(environ.get('QA_WORKERS', cpu_count() or 1))
+QA_CONCURRENCY = {
+    'tfidf': int(environ.get('QA_CONCURRENCY_TFIDF', QA_WORKERS)),
+    'word2vec': int(environ.get('QA_CONCURRENCY_WORD2VEC', QA_WORKERS)),
+    'doc2vec': int(environ.get('QA_CONCURRENCY_DOC2VEC', max(1, QA_WORKERS // 2)))
+}
+QA_BATCH_SIZE = int(environ.get('QA_BATCH_SIZE', 256))
+QA_RESULT_CACHE_SIZE = int(environ.get('QA_RESULT_CACHE_SIZE', 1024))
+QA_RESULT_CACHE_TTL = float(environ['QA_RESULT_CACHE_TTL']) \
+    if environ.get('QA_RESULT_CACHE_TTL') else None
+QA_PROFILE = int(environ.get('QA_PROFILE', 0))
+QA_PROFILE_INTERVAL = float(environ.get('QA_PROFILE_INTERVAL', 60))
+QA_RELOAD_INTERVAL = float(environ.get('QA_RELOAD_INTERVAL', 5))
+QA_KEEP_VERSIONS = int(environ.get('QA_KEEP_VERSIONS', 0))
+QA_WARMUP_QUERY = environ.get('QA_WARMUP_QUERY', 'hak warga negara')
 
 app = FastAPI()
 
-models = {
-    'tfidf': Tfidf(cache='.cache/tfidf'),
-    'doc2vec': Doc2vec(cache='.cache/doc2vec'),
-    'word2vec': Word2vec(cache='.cache/word2vec')
-}
+
+class Deployment:
+    """A loaded cache version, the executor scoring it and its in-flight requests."""
+
+    def __init__(self, version: Optional[str], executor: Executor, owns_executor: bool):
+        self.version = version
+        self.executor = executor
+        self.owns_executor = owns_executor
+        self.requests = 0
+        self.retired = False
+
+
+store = CacheStore()
+models: Dict[Optional[str], Dict[str, Any]] = {}
+executor: Optional[Executor] = None
+active: Optional[Deployment] = None
+retired: List[Deployment] = []
+reload_lock: Optional[asyncio.Lock] = None
+watcher: Optional[asyncio.Task] = None
+cleanups: Set[asyncio.Future] = set()
+limits: Dict[str, asyncio.Semaphore] = {}
+result_cache = LruCache(QA_RESULT_CACHE_SIZE, ttl=QA_RESULT_CACHE_TTL)
+generation = 0
+load_seconds: Dict[str, float] = {}
+profiler = Profiler(interval=QA_PROFILE_INTERVAL)
+
+
+def load_models(version: Optional[str]):
+    loaded, seconds = {}, {}
+    for algorithm, model_class in (('tfidf', Tfidf), ('doc2vec', Doc2vec), ('word2vec', Word2vec)):
+        start = time.perf_counter()
+        loaded[algorithm] = model_class(cache=str(store.path(version) / algorithm))
+        # Touch the memory-mapped arrays before the version takes traffic.
+        loaded[algorithm].ask(query=tokenize(QA_WARMUP_QUERY), num_rank=1,
+                              **default_options(algorithm))
+        seconds[algorithm] = time.perf_counter() - start
+    models[version] = loaded
+    load_seconds.update(seconds)
+
+
+def model_load_seconds() -> Dict[str, float]:
+    return dict(load_seconds)
+
+
+def init_worker(version: Optional[str], barrier):
+    load_models(version)
+    # No worker takes calls before every worker of the pool is warm.
+    barrier.wait()
+
+
+def model_cache_bytes() -> List[Tuple[Dict[str, str], float]]:
+    if active is None:
+        return []
+    path = store.path(active.version)
+    return [({'algorithm': algorithm},
+             sum(f.stat().st_size for f in Path(path, algorithm).glob('*') if f.is_file()))
+            for algorithm in SUPPORTED_ALGORITHM]
+
+
+def ask_model(version: Optional[str], algorithm: str, query: str, num_rank: int,
+              options: dict) -> Tuple[Ranking, Dict[str, float]]:
+    with record_stages() as timings:
+        answer = models[version][algorithm].ask(query=query.split(), num_rank=num_rank, **options)
+    return answer, timings
+
+
+def profile_model(version: Optional[str], algorithm: str, query: str, num_rank: int,
+                  options: dict) -> Tuple[Ranking, Dict[str, float], str]:
+    (answer, timings), path = profiler.run(
+        algorithm, query, partial(ask_model, version, algorithm, query, num_rank, options))
+    return answer, timings, str(path)
+
+
+def ask_batch_model(version: Optional[str], algorithm: str, queries: List[str],
+                    num_rank: int) -> Tuple[List[Ranking], Dict[str, float]]:
+    with record_stages() as timings:
+        answers = models[version][algorithm].ask_batch([query.split() for query in queries],
+                                                       num_rank=num_rank)
+    return answers, timings
+
+
+metrics = Metrics()
+request_seconds = metrics.histogram(
+    'qa_request_seconds', 'End-to-end HTTP request latency.')
+requests_total = metrics.counter(
+    'qa_requests_total', 'HTTP requests by endpoint, algorithm and status code.')
+stage_seconds = metrics.histogram(
+    'qa_stage_seconds', 'Time spent per request stage.')
+scoring_seconds = metrics.histogram(
+    'qa_scoring_seconds', 'Model call latency including executor queueing.')
+answers_total = metrics.counter(
+    'qa_answers_total', 'Answers served from the result cache or computed.')
+metrics.gauge('qa_model_load_seconds', 'Time taken to load each model cache.',
+              lambda: [({'algorithm': a}, s) for a, s in load_seconds.items()])
+metrics.gauge('qa_model_cache_bytes', 'Size of each model cache on disk.',
+              model_cache_bytes)
+metrics.gauge('qa_result_cache', 'Result cache size and counters.',
+              lambda: [({'stat': stat}, value) for stat, value in result_cache.stats().items()
+                       if value is not None])
+metrics.gauge('qa_model_version', 'Cache version currently serving requests.',
+              lambda: [({'version': active.version or 'legacy'}, 1.0)] if active else [])
+reloads_total = metrics.counter(
+    'qa_reloads_total', 'Model cache reloads by result.')
+
+
+def exact_options(algorithm: str) -> dict:
+    if algorithm == 'tfidf':
+        return {'inverted': False}
+    return {'nprobe': None}
+
+
+def default_options(algorithm: str) -> dict:
+    if algorithm == 'tfidf':
+        return {'inverted': bool(TFIDF_INVERTED)}
+    return exact_options(algorithm)
+
+
+def normalize_query(query: str) -> str:
+    return ' '.join(tokenize(query))
+
+
+async def start_deployment(version: Optional[str]) -> Deployment:
+    loop = asyncio.get_running_loop()
+    if QA_EXECUTOR == 'process':
+        context = mp.get_context('spawn')
+        manager = await loop.run_in_executor(None, context.Manager)
+        try:
+            pool = ProcessPoolExecutor(max_workers=QA_WORKERS, mp_context=context,
+                                       initializer=init_worker,
+                                       initargs=(version, manager.Barrier(QA_WORKERS)))
+            try:
+                # Workers may be started on demand, so send one call per worker.
+                for seconds in await asyncio.gather(
+                        *[loop.run_in_executor(pool, model_load_seconds)
+                          for _ in range(QA_WORKERS)]):
+                    load_seconds.update(seconds)
+            except BaseException:
+                await loop.run_in_executor(None, pool.shutdown)
+                raise
+        finally:
+            await loop.run_in_executor(None, manager.shutdown)
+        return Deployment(version, pool, owns_executor=True)
+
+    await loop.run_in_executor(None, load_models, version)
+    return Deployment(version, executor, owns_executor=False)
+
+
+def acquire_deployment() -> Deployment:
+    active.requests += 1
+    return active
+
+
+def release_deployment(deployment: Deployment):
+    deployment.requests -= 1
+    if deployment.retired and deployment.requests == 0:
+        stop_deployment(deployment)
+
+
+def retire_deployment(deployment: Deployment):
+    deployment.retired = True
+    retired.append(deployment)
+    if deployment.requests == 0:
+        stop_deployment(deployment)
+
+
+def stop_deployment(deployment: Deployment):
+    retired.remove(deployment)
+    if not deployment.owns_executor and \
+            all(d.version != deployment.version for d in [active, *retired]):
+        models.pop(deployment.version, None)
+    loaded = [d.version for d in [active, *retired]]
+    cleanups.add(asyncio.ensure_future(cleanup_deployment(deployment, loaded)))
+
+
+async def cleanup_deployment(deployment: Deployment, loaded: List[Optional[str]]):
+    loop = asyncio.get_running_loop()
+    try:
+        if deployment.owns_executor:
+            await loop.run_in_executor(None, deployment.executor.shutdown)
+        removed = []
+        if QA_KEEP_VERSIONS > 0:
+            removed = await loop.run_in_executor(None, store.prune, QA_KEEP_VERSIONS, loaded)
+        logging.info(f'Released model cache version {deployment.version or "legacy"}'
+                     + (f', removed {", ".join(removed)}' if removed else ''))
+    except Exception:
+        logging.exception(f'Failed to clean up model cache version {deployment.version}')
+    finally:
+        cleanups.discard(asyncio.current_task())
+
+
+async def reload_models() -> Tuple[Optional[str], Optional[str]]:
+    global active, generation
+    async with reload_lock:
+        version = store.current()
+        previous = active.version
+        if version == previous:
+            return previous, previous
+
+        try:
+            deployment = await start_deployment(version)
+        except Exception:
+            reloads_total.inc(status='error')
+            raise
+
+        previous_deployment, active = active, deployment
+        generation += 1
+        result_cache.clear()
+        reloads_total.inc(status='success')
+        logging.info(f'Serving model cache version {version} (was {previous or "legacy"})')
+        retire_deployment(previous_deployment)
+        return version, previous
+
+
+async def watch_store():
+    failed = None
+    while True:
+        await asyncio.sleep(QA_RELOAD_INTERVAL)
+        version = store.current()
+        if version != active.version and version != failed:
+            try:
+                await reload_models()
+            except Exception:
+                # Retried once CURRENT points somewhere else or on /admin/reload.
+                failed = version
+                logging.exception(f'Failed to reload model cache version {version}')
+
+
+@app.on_event('startup')
+async def startup():
+    global executor, active, generation, reload_lock, watcher
+    if QA_EXECUTOR != 'process':
+        executor = ThreadPoolExecutor(max_workers=QA_WORKERS)
+    active = await start_deployment(store.current())
+    reload_lock = asyncio.Lock()
+
+    generation += 1
+    result_cache.clear()
+
+    for algorithm, concurrency in QA_CONCURRENCY.items():
+        limits[algorithm] = asyncio.Semaphore(concurrency)
+    if QA_RELOAD_INTERVAL > 0:
+        watcher = asyncio.ensure_future(watch_store())
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    if watcher is not None:
+        watcher.cancel()
+    if cleanups:
+        await asyncio.gather(*cleanups)
+    for deployment in [active, *retired]:
+        deployment.executor.shutdown()
+
+
+def observe_stages(algorithm: str, timings: Dict[str, float]):
+    for name, seconds in timings.items():
+        stage_seconds.observe(seconds, algorithm=algorithm, stage=name)
+
+
+def preprocess(algorithm: str, query: str) -> str:
+    start = time.perf_counter()
+    query = normalize_query(query)
+    stage_seconds.observe(time.perf_counter() - start, algorithm=algorithm, stage='preprocess')
+    return query
+
+
+def render_response(algorithm: str, data: Any) -> Response:
+    start = time.perf_counter()
+    response = JSONResponse(jsonable_encoder(success_response(data)))
+    stage_seconds.observe(time.perf_counter() - start, algorithm=algorithm, stage='serialization')
+    return response
+
+
+def cache_key(algorithm: str, query: str, num_rank: int, options: dict) -> tuple:
+    return generation, algorithm, query, num_rank, tuple(sorted(options.items()))
+
+
+async def call_model(algorithm: str, func: Callable, *args) -> Any:
+    deployment = acquire_deployment()
+    try:
+        with scoring_seconds.time(algorithm=algorithm):
+            async with limits[algorithm]:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    deployment.executor, partial(func, deployment.version, algorithm, *args))
+    finally:
+        release_deployment(deployment)
+
+
+async def run_scoring(algorithm: str, query: str, num_rank: int, options: dict) -> Ranking:
+    key = cache_key(algorithm, query, num_rank, options)
+    answer: Optional[Ranking] = result_cache.get(key)
+    if answer is not None:
+        answers_total.inc(algorithm=algorithm, cache='hit')
+        return answer
+
+    answers_total.inc(algorithm=algorithm, cache='miss')
+    answer, timings = await call_model(algorithm, ask_model, query, num_rank, options)
+    observe_stages(algorithm, timings)
+    result_cache.put(key, answer)
+    return answer
+
+
+async def run_profiled(algorithm: str, query: str, num_rank: int,
+                       options: dict) -> Tuple[Ranking, str]:
+    answer, timings, path = await call_model(
+        algorithm, profile_model, query, num_rank, options)
+    observe_stages(algorithm, timings)
+    result_cache.put(cache_key(algorithm, query, num_rank, options), answer)
+    logging.info(f'Profile of {algorithm} "{query}" written to {path}')
+    return answer, path
+
+
+async def run_batch_scoring(algorithm: str, queries: List[str], num_rank: int) -> List[Ranking]:
+    # ask_batch scores every document, so its answers belong to the exact path.
+    options = exact_options(algorithm)
+    answers: Dict[str, Ranking] = {}
+    for query in queries:
+        answer = result_cache.get(cache_key(algorithm, query, num_rank, options))
+        if answer is not None:
+            answers[query] = answer
+    answers_total.inc(len(answers), algorithm=algorithm, cache='hit')
+
+    missing = list(dict.fromkeys(q for q in queries if q not in answers))
+    answers_total.inc(len(missing), algorithm=algorithm, cache='miss')
+    for start in range(0, len(missing), QA_BATCH_SIZE):
+        block = missing[start:start + QA_BATCH_SIZE]
+        block_answers, timings = await call_model(
+            algorithm, ask_batch_model, block, num_rank)
+        observe_stages(algorithm, timings)
+        for query, answer in zip(block, block_answers):
+            answers[query] = answer
+            result_cache.put(cache_key(algorithm, query, num_rank, options), answer)
+
+    return [answers[query] for query in queries]
+
+
+@app.middleware('http')
+async def record_request(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    endpoint = getattr(request.scope.get('endpoint'), '__name__', 'unknown')
+    algorithm = request.scope.get('path_params', {}).get('algorithm', '')
+    if algorithm and algorithm not in SUPPORTED_ALGORITHM:
+        algorithm = 'unsupported'
+    request_seconds.observe(time.perf_counter() - start,
+                            endpoint=endpoint, algorithm=algorithm)
+    requests_total.inc(endpoint=endpoint, algorithm=algorithm,
+                       status=str(response.status_code))
+    return response
 
 
 @app.get('/')
@@ -29,6 +406,29 @@ async def root():
             'data': []}
 
 
+@app.get('/admin/cache')
+async def cache_stats():
+    return success_response(result_cache.stats())
+
+
+@app.post('/admin/reload')
+async def reload(response: Response):
+    try:
+        version, previous = await reload_models()
+    except Exception as e:
+        logging.exception('Failed to reload the model cache')
+        response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return fail_response({'reload': str(e)})
+    return success_response({'version': version,
+                             'previous': previous,
+                             'load_seconds': model_load_seconds()})
+
+
+@app.get('/metrics')
+async def metrics_text():
+    return Response(metrics.render(), media_type=Metrics.content_type)
+
+
 def success_response(data: dict) -> dict:
     return {'status': 'success',
             'data': data}
@@ -39,8 +439,63 @@ def fail_response(data: dict) -> dict:
             'data': data}
 
 
+class BatchQuestion(BaseModel):
+    questions: List[str]
+    algorithms: List[str] = ['tfidf']
+    num_rank: int = 10
+
+
+@app.post('/batch/', status_code=200)
+async def ask_batch(response: Response, body: BatchQuestion):
+    unsupported = [a for a in body.algorithms
+                   if a not in ('tfidf', 'word2vec', 'doc2vec')]
+    if unsupported or not body.algorithms:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return fail_response({'algorithms': 'Supported algorithm: tfidf, word2vec, doc2vec'})
+
+    queries = [preprocess('batch', q) for q in body.questions]
+    algorithms = list(dict.fromkeys(body.algorithms))
+    results = await asyncio.gather(*[run_batch_scoring(algorithm, queries, body.num_rank)
+                                     for algorithm in algorithms])
+
+    data = []
+    for i, question in enumerate(body.questions):
+        data.append({
+            'question': question,
+            'answer': {algorithm: answers[i].responses
+                       for algorithm, answers in zip(algorithms, results)}
+        })
+    return render_response('batch', data)
+
+
+@app.get('/ensemble/', status_code=200)
+async def ask_ensemble(response: Response, q: Optional[str] = None, num_rank: Optional[int] = 10,
+                       fuse: bool = False, fusion_depth: Optional[int] = None):
+    if q is None:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return fail_response({'q': 'Question is required!'})
+
+    query = preprocess('ensemble', q)
+    algorithms = ('tfidf', 'word2vec', 'doc2vec')
+    depth = max(num_rank, fusion_depth or num_rank) if fuse else num_rank
+    rankings = await asyncio.gather(*[run_scoring(algorithm, query, depth, default_options(algorithm))
+                                      for algorithm in algorithms])
+
+    answer = {algorithm: ranking.responses[:num_rank]
+              for algorithm, ranking in zip(algorithms, rankings)}
+    if fuse:
+        answer['fusion'] = reciprocal_rank_fusion(rankings, num_rank).responses
+    data = {
+        'question': q,
+        'answer': answer
+    }
+    return render_response('ensemble', data)
+
+
 @app.get('/{algorithm}/', status_code=200)
-async def ask(response: Response, algorithm: str, q: Optional[str] = None, num_rank: Optional[int] = 10):
+async def ask(response: Response, algorithm: str, q: Optional[str] = None, num_rank: Optional[int] = 10,
+              nprobe: Optional[int] = None, profile: bool = False,
+              x_profile: Optional[str] = Header(None)):
     if algorithm not in ('tfidf', 'word2vec', 'doc2vec'):
         response.status_code = status.HTTP_400_BAD_REQUEST
         return fail_response({'algorithm': 'Supported algorithm: tfidf, word2vec, doc2vec'})
@@ -49,13 +504,24 @@ async def ask(response: Response, algorithm: str, q: Optional[str] = None, num_r
         response.status_code = status.HTTP_400_BAD_REQUEST
         return fail_response({'q': 'Question is required!'})
 
-    answer: pd.DataFrame = models[algorithm].ask(query=q, num_rank=num_rank)
-    if not answer.empty:
+    options = default_options(algorithm)
+    if algorithm != 'tfidf':
+        options['nprobe'] = nprobe
+    query = preprocess(algorithm, q)
+    profile_path = None
+    profile_requested = profile or x_profile in ('1', 'true')
+    if QA_PROFILE and profile_requested and profiler.acquire():
+        answer, profile_path = await run_profiled(algorithm, query, num_rank, options)
+    else:
+        answer = await run_scoring(algorithm, query, num_rank, options)
+    if len(answer.responses) > 0:
         data = {
             'question': q,
-            'answer': answer['Response'].to_list()
+            'answer': answer.responses
         }
-        return success_response(data)
+        if QA_PROFILE and profile_requested:
+            data['profile'] = profile_path
+        return render_response(algorithm, data)
 
 
 if __name__ == "__main__":